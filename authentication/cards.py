@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+CARD_TIMEOUT = getattr(settings, 'USER_CARD_CACHE_TIMEOUT', 24 * 60 * 60)
+
+
+def card_key(user_id):
+    return f'auth:user-card:{user_id}'
+
+
+def user_card(user):
+    """The public card nested wherever a user appears in another resource."""
+    profile = getattr(user, 'profile', None)
+    image = profile.image if profile is not None else None
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'avatar': image.url if image else None,
+    }
+
+
+def get_user_cards(user_ids):
+    """
+    Map user ids to their cards with one cache multi-get. Misses are loaded
+    together with their profiles in one query and cached for the next
+    request. Unknown ids are left out.
+    """
+    keys = {user_id: card_key(user_id) for user_id in set(user_ids)}
+    if not keys:
+        return {}
+    cached = cache.get_many(list(keys.values()))
+    cards = {user_id: cached[key] for user_id, key in keys.items() if key in cached}
+
+    missing = set(keys) - set(cards)
+    if missing:
+        fresh = {user.id: user_card(user) for user in User.objects.filter(id__in=missing).select_related('profile')}
+        cache.set_many({card_key(user_id): card for user_id, card in fresh.items()}, CARD_TIMEOUT)
+        cards.update(fresh)
+    return cards
+
+
+def invalidate_user_cards(*user_ids):
+    cache.delete_many([card_key(user_id) for user_id in user_ids])
@@ -0,0 +1,68 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from .models import Profile
+
+Follow = Profile.following.through
+
+# Sent inside set_following's transaction with `follower`, `target` and
+# `following` when a follow is added or removed. The auto-created through
+# table sends no model signals and set_following bypasses m2m_changed, so
+# apps caching follow state listen for this instead.
+follow_changed = Signal()
+
+
+def count_subquery(queryset, column):
+    counts = queryset.order_by().values(column).annotate(total=Count('*')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def follow_counters():
+    """Expressions recomputing the stored follow counts of a profile from its rows."""
+    return {
+        'follower_count': count_subquery(Follow.objects.filter(to_profile_id=OuterRef('pk')), 'to_profile_id'),
+        'following_count': count_subquery(Follow.objects.filter(from_profile_id=OuterRef('pk')), 'from_profile_id'),
+    }
+
+
+def recount_follows(profile_ids):
+    Profile.objects.filter(id__in=profile_ids).update(**follow_counters())
+
+
+def set_following(follower, target, following):
+    """
+    Make the `follower` profile follow or unfollow `target`.
+
+    As with likes, the change is decided by the unique constraint on INSERT
+    or the row count of a DELETE, and both stored counts move in the same
+    transaction, so repeated or concurrent requests cannot skew them.
+    Returns whether anything changed and the target's follower count.
+    """
+    lookup = {'from_profile_id': follower.id, 'to_profile_id': target.id}
+    with transaction.atomic():
+        if following:
+            try:
+                with transaction.atomic():
+                    Follow.objects.create(**lookup)
+                changed = True
+            except IntegrityError:
+                changed = False
+        else:
+            changed = Follow.objects.filter(**lookup).delete()[0] > 0
+
+        if changed:
+            step = 1 if following else -1
+            Profile.objects.filter(id=target.id).update(follower_count=F('follower_count') + step)
+            Profile.objects.filter(id=follower.id).update(following_count=F('following_count') + step)
+            follow_changed.send(sender=Profile, follower=follower, target=target, following=following)
+        count = Profile.objects.filter(id=target.id).values_list('follower_count', flat=True).first()
+    return changed, count
+
+
+def followed_user_ids(user, user_ids):
+    """The subset of `user_ids` that `user` follows, in one query."""
+    return set(
+        Follow.objects.filter(from_profile__user_id=user.id, to_profile__user_id__in=user_ids)
+        .values_list('to_profile__user_id', flat=True)
+    )
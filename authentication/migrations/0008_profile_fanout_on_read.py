@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0007_profile_phone_alter_profile_gender'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='fanout_on_read',
+            field=models.BooleanField(default=False),
+        ),
+    ]
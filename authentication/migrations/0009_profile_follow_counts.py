@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:00
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Profile = apps.get_model('authentication', 'Profile')
+    Follow = Profile.following.through
+
+    def count_subquery(queryset, column):
+        counts = queryset.order_by().values(column).annotate(total=Count('*')).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    Profile.objects.update(
+        follower_count=count_subquery(Follow.objects.filter(to_profile_id=OuterRef('pk')), 'to_profile_id'),
+        following_count=count_subquery(Follow.objects.filter(from_profile_id=OuterRef('pk')), 'from_profile_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0008_profile_fanout_on_read'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
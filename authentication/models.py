@@ -10,10 +10,15 @@ class Profile(models.Model):
     phone = models.CharField(max_length=15, blank=True, null=True)
     # followers = models.ManyToManyField('self', symmetrical=False, related_name='following')
     following = models.ManyToManyField('self', symmetrical=False, related_name='followers')
+    # Stored counts of the rows in `following`, kept in step by authentication.follows
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     date_of_birth = models.DateField(null=True, blank=True)
     gender = models.CharField(max_length=10, choices=[('Male', 'Male'), ('Female', 'Female'), ('Kids', 'Kids')])
     is_subscribed = models.BooleanField(default=False)
+    # Set once the account has too many followers to fan posts out on write
+    fanout_on_read = models.BooleanField(default=False)
 
     def __str__(self):
         return f"Profile of {self.user.username}"
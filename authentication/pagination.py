@@ -0,0 +1,6 @@
+from mat.pagination import KeysetPagination
+
+
+class FollowCursorPagination(KeysetPagination):
+    # Follow rows have no timestamp; the pk is their insertion order
+    ordering = ('-id',)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from .cards import get_user_cards
 from .models import Profile
 
 class UserSerializer(serializers.ModelSerializer):
@@ -7,6 +8,28 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
 
+class UserCardField(serializers.Field):
+    """
+    A nested user, serialized from the user-card cache. Point `source` at the
+    user id. Cards batch-loaded by the view are read from
+    context['user_cards']; any other id costs a lookup of its own.
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, user_id):
+        cards = self.context.get('user_cards')
+        if cards is None or user_id not in cards:
+            return get_user_cards([user_id]).get(user_id)
+        return cards[user_id]
+
+class UserAvatarField(UserCardField):
+    """The avatar URL from a user's card."""
+    def to_representation(self, user_id):
+        card = super().to_representation(user_id)
+        return card['avatar'] if card else None
+
 class ProfileSerializer(serializers.ModelSerializer):
     # user = UserSerializer(read_only=True)
     first_name = serializers.CharField(source='user.first_name', read_only=True)
@@ -14,7 +37,9 @@ class ProfileSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(source='user.email', read_only=True)
     class Meta:
         model = Profile
-        fields = ['user', 'image', 'first_name', 'last_name', 'phone', 'email', 'following', 'date_of_birth', 'gender', 'created_at']
+        # Follows are paged by the follower/following endpoints; only the stored counts are embedded
+        fields = ['user', 'image', 'first_name', 'last_name', 'phone', 'email', 'follower_count', 'following_count', 'date_of_birth', 'gender', 'created_at']
+        read_only_fields = ['follower_count', 'following_count']
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
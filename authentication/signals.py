@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .cards import invalidate_user_cards
+from .follows import Follow, recount_follows
+from .models import Profile
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_card(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which is not on the card
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    # After commit, so a concurrent read cannot cache the old row again
+    transaction.on_commit(lambda: invalidate_user_cards(instance.pk))
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile_card(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_user_cards(instance.user_id))
+
+
+@receiver(m2m_changed, sender=Profile.following.through)
+def recount_changed_follows(sender, instance, action, reverse, pk_set, **kwargs):
+    # following.add()/remove()/clear() bypass set_following, so the stored
+    # counts of every profile involved are recomputed from the rows
+    if action == 'pre_clear':
+        partners = Follow.objects.filter(**{'to_profile_id' if reverse else 'from_profile_id': instance.pk})
+        instance._cleared_follows = set(partners.values_list('from_profile_id' if reverse else 'to_profile_id', flat=True))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        recount_follows({instance.pk, *pk_set})
+    elif action == 'post_clear':
+        recount_follows({instance.pk, *getattr(instance, '_cleared_follows', ())})
+
+
+@receiver(pre_delete, sender=Profile)
+def remember_follow_partners(sender, instance, **kwargs):
+    instance._follow_partners = set(
+        Follow.objects.filter(to_profile_id=instance.pk).values_list('from_profile_id', flat=True)
+    ) | set(Follow.objects.filter(from_profile_id=instance.pk).values_list('to_profile_id', flat=True))
+
+
+@receiver(post_delete, sender=Profile)
+def recount_follow_partners(sender, instance, **kwargs):
+    # The follow rows go with the profile without signals of their own
+    if getattr(instance, '_follow_partners', None):
+        recount_follows(instance._follow_partners)
@@ -1,7 +1,9 @@
+from django.core.cache import cache
 from django.test import TestCase
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
+from .cards import get_user_cards
 from .models import RegistrationVerifyCode, Profile, PasswordResetCode
 
 class AuthTests(TestCase):
@@ -96,3 +98,95 @@ class AuthTests(TestCase):
         login_data = {'email': 'auth@example.com', 'password': 'newpassword123'}
         response = self.client.post(self.login_url, login_data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class UserCardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'card{i}@example.com', first_name=f'Card{i}') for i in range(3)]
+        Profile.objects.create(user=self.users[0], gender='Male', image='profile_images/card0.jpg')
+
+    def test_cards_are_loaded_once_and_then_served_from_the_cache(self):
+        ids = [user.id for user in self.users]
+        with self.assertNumQueries(1):
+            cards = get_user_cards(ids)
+        self.assertEqual(cards[ids[0]]['avatar'], '/media/profile_images/card0.jpg')
+        self.assertIsNone(cards[ids[1]]['avatar'])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_cards(ids), cards)
+
+    def test_user_and_profile_saves_invalidate_the_card(self):
+        user = self.users[0]
+        get_user_cards([user.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            user.first_name = 'Renamed'
+            user.save()
+        self.assertEqual(get_user_cards([user.id])[user.id]['first_name'], 'Renamed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Profile.objects.filter(user=user).first().delete()
+        self.assertIsNone(get_user_cards([user.id])[user.id]['avatar'])
+
+
+
+class FollowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.users = [User.objects.create_user(username=f'follow{i}@example.com') for i in range(5)]
+        self.profiles = [Profile.objects.create(user=user, gender='Male') for user in self.users]
+        self.client.force_authenticate(user=self.users[0])
+
+    def follow(self, user, method='post'):
+        return getattr(self.client, method)(f'/auth/users/{user.id}/follow/')
+
+    def test_follow_and_unfollow_keep_the_stored_counts(self):
+        star = self.users[1]
+        self.assertEqual(self.follow(star).data, {'following': True, 'follower_count': 1})
+        self.assertEqual(self.follow(star).data['follower_count'], 1)
+        for fan in self.users[2:]:
+            self.client.force_authenticate(user=fan)
+            self.follow(star)
+
+        self.assertEqual(self.follow(star, 'delete').data, {'following': False, 'follower_count': 3})
+        self.assertEqual(self.follow(star, 'delete').data['follower_count'], 3)
+        self.assertEqual(self.follow(self.users[-1]).status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=star)
+        with self.assertNumQueries(1):
+            response = self.client.get('/auth/profile/')
+        self.assertEqual((response.data['follower_count'], response.data['following_count']), (3, 0))
+        self.assertNotIn('following', response.data)
+
+    def test_counts_follow_direct_relation_changes(self):
+        first, second, third = self.profiles[:3]
+        first.following.add(second, third)
+        second.followers.add(third)
+        self.assertEqual(
+            list(Profile.objects.filter(id__in=[first.id, second.id, third.id]).order_by('id').values_list('follower_count', 'following_count')),
+            [(0, 2), (2, 0), (1, 1)],
+        )
+        first.following.clear()
+        third.delete()
+        self.assertEqual(list(Profile.objects.filter(id__in=[first.id, second.id]).order_by('id').values_list('follower_count', 'following_count')), [(0, 0), (0, 0)])
+
+    def test_follow_lists_are_paginated_with_viewer_state(self):
+        star = self.users[1]
+        for fan in self.users[2:]:
+            self.profiles[self.users.index(fan)].following.add(self.profiles[1])
+        self.follow(self.users[3])
+
+        seen, url = [], f'/auth/users/{star.id}/followers/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.extend(response.data['results'])
+            url = response.data['next']
+        self.assertEqual([card['id'] for card in seen], [user.id for user in reversed(self.users[2:])])
+        self.assertEqual([card['is_following'] for card in seen], [False, True, False])
+
+        response = self.client.get(f'/auth/users/{self.users[2].id}/following/')
+        self.assertEqual([card['username'] for card in response.data['results']], [star.username])
+
+        ids = ','.join(str(user.id) for user in self.users)
+        self.assertEqual(self.client.get(f'/auth/following/check/?users={ids}').data, {'following': [self.users[3].id]})
+        self.assertEqual(self.client.get('/auth/following/check/?users=a').status_code, status.HTTP_400_BAD_REQUEST)
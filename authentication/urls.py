@@ -10,5 +10,9 @@ urlpatterns = [
     path('password-reset/verify/', views.VerifyPasswordResetCodeView.as_view(), name='password-reset-verify'),
     path('password-reset/change/', views.ChangePasswordView.as_view(), name='password-reset-change'),
     path('profile/', views.ProfileView.as_view(), name='profile'),
-    path('change-password/', views.ChangePassword.as_view(), name='change-password')
+    path('change-password/', views.ChangePassword.as_view(), name='change-password'),
+    path('users/<int:user_id>/follow/', views.FollowView.as_view(), name='follow'),
+    path('users/<int:user_id>/followers/', views.FollowListView.as_view(relation='followers'), name='followers'),
+    path('users/<int:user_id>/following/', views.FollowListView.as_view(relation='following'), name='following'),
+    path('following/check/', views.FollowingCheckView.as_view(), name='following-check'),
 ]
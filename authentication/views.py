@@ -7,6 +7,13 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import permissions
+from rest_framework.parsers import JSONParser, FormParser
+from mat.uploads import ImageMultiPartParser
+from notification.dispatch import dispatch_notification
+from .cards import get_user_cards
+from .follows import Follow, set_following, followed_user_ids
+from .pagination import FollowCursorPagination
+from django.db.models import F
 from django.utils import timezone
 import random
 import string
@@ -230,9 +237,10 @@ class ChangePasswordView(APIView):
 
 class ProfileView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [JSONParser, ImageMultiPartParser, FormParser]
 
     def get(self, request):
-        profile = get_object_or_404(Profile, user=request.user)
+        profile = get_object_or_404(Profile.objects.select_related('user'), user=request.user)
         serializer = ProfileSerializer(profile)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -270,4 +278,74 @@ class ChangePassword(APIView):
 
         user.set_password(new_password)
         user.save()
-        return Response({"message": "Password has been changed successfully!"}, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({"message": "Password has been changed successfully!"}, status=status.HTTP_200_OK)
+
+
+class FollowView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, user_id):
+        return self.set_following(request, user_id, following=True)
+
+    def delete(self, request, user_id):
+        return self.set_following(request, user_id, following=False)
+
+    def set_following(self, request, user_id, following):
+        follower = Profile.objects.filter(user=request.user).only('id').first()
+        if follower is None:
+            return Response({"error": "Complete your profile first"}, status=status.HTTP_400_BAD_REQUEST)
+        target = Profile.objects.filter(user_id=user_id).only('id', 'user_id').first()
+        if target is None:
+            return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+        if target.id == follower.id:
+            return Response({"error": "You cannot follow yourself"}, status=status.HTTP_400_BAD_REQUEST)
+
+        changed, follower_count = set_following(follower, target, following)
+        if following and changed:
+            dispatch_notification(
+                target.user_id,
+                title="New Follower",
+                body=f"{request.user.username} started following you.",
+                data={"type": "follow", "user_id": str(request.user.id)}
+            )
+        return Response({'following': following, 'follower_count': follower_count}, status=status.HTTP_200_OK)
+
+
+class FollowListView(APIView):
+    """
+    A user's followers (relation='followers') or followed users
+    (relation='following'), newest follow first, as user cards.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    relation = 'followers'
+
+    def get(self, request, user_id):
+        profile = get_object_or_404(Profile.objects.only('id'), user_id=user_id)
+        if self.relation == 'followers':
+            rows = Follow.objects.filter(to_profile_id=profile.id).annotate(listed_id=F('from_profile__user_id'))
+        else:
+            rows = Follow.objects.filter(from_profile_id=profile.id).annotate(listed_id=F('to_profile__user_id'))
+
+        paginator = FollowCursorPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        user_ids = [row.listed_id for row in page]
+        cards = get_user_cards(user_ids)
+        followed = followed_user_ids(request.user, user_ids)
+        results = [{**cards[user_id], 'is_following': user_id in followed} for user_id in user_ids if user_id in cards]
+        return paginator.get_paginated_response(results)
+
+
+class FollowingCheckView(APIView):
+    """Which of ?users=1,2,3 the requester follows, e.g. for a page of authors."""
+    permission_classes = [permissions.IsAuthenticated]
+    max_users = 100
+
+    def get(self, request):
+        try:
+            user_ids = {int(value) for value in request.query_params.get('users', '').split(',') if value.strip()}
+        except ValueError:
+            return Response({"error": "users must be a comma-separated list of ids"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(user_ids) > self.max_users:
+            return Response({"error": f"At most {self.max_users} users can be checked at once"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'following': sorted(followed_user_ids(request.user, user_ids))}, status=status.HTTP_200_OK)
+
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+# Unfiltered changelists switch to an estimated count above this many rows
+EXACT_COUNT_LIMIT = getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 100_000)
+
+
+def estimated_row_count(model, using='default'):
+    """
+    A cheap estimate of the rows in `model`'s table: the planner statistics
+    on PostgreSQL, the highest primary key on SQLite (one B-tree descent).
+    None when the backend offers neither.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        # -1 until the table has been analyzed
+        return row[0] if row and row[0] >= 0 else None
+    if connection.vendor == 'sqlite':
+        return model._default_manager.using(using).aggregate(top=Max('pk'))['top'] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator for very large tables. The unfiltered changelist is
+    sized with estimated_row_count instead of COUNT(*) once the table passes
+    EXACT_COUNT_LIMIT; filtered and searched lists are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables too big to count or to list as filter
+    options: estimated page counts and no second COUNT(*) for the
+    unfiltered total. Subclasses edit foreign keys by id or autocomplete
+    instead of a <select> of every row.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
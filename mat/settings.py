@@ -94,6 +94,18 @@ DATABASES = {
 }
 
 
+# Cache
+# Use a shared backend (e.g. Redis or Memcached) in production so content
+# version bumps reach every worker process.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='mat'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -155,6 +167,68 @@ FCM_DJANGO_SETTINGS = {
 }
 
 
+# Home timeline fan-out
+TIMELINE_FANOUT_BATCH_SIZE = 1000
+TIMELINE_FANOUT_FOLLOWER_LIMIT = 10000
+# Latest posts of a newly followed author copied into the follower's timeline
+TIMELINE_FOLLOW_BACKFILL_LIMIT = 50
+
+# Trending scores halve every TRENDING_HALF_LIFE_HOURS (see social/trending.py)
+TRENDING_HALF_LIFE_HOURS = 24
+
+# Dotted path to a social.search.SearchBackend; defaults to FTS5 on SQLite
+SOCIAL_SEARCH_BACKEND = None
+
+# Versioned response cache for the public post endpoints (social/caching.py)
+SOCIAL_RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+# Per-post serialized card fragments, keyed by Post.cache_version (social/fragments.py)
+SOCIAL_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Nested user cards (id, names, avatar), invalidated on User/Profile save (authentication/cards.py)
+USER_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Post views are buffered per process and flushed by a background thread every POST_VIEW_FLUSH_INTERVAL
+# seconds or POST_VIEW_FLUSH_THRESHOLD views; repeats within
+# POST_VIEW_DEDUPE_SECONDS are not counted (social/impressions.py)
+POST_VIEW_FLUSH_INTERVAL = 30
+POST_VIEW_FLUSH_THRESHOLD = 1000
+POST_VIEW_DEDUPE_SECONDS = 30 * 60
+
+# Push notifications are sent after commit from a thread pool of this size;
+# NOTIFICATION_DISPATCH_SYNC sends them inline instead (notification/dispatch.py)
+NOTIFICATION_DISPATCH_WORKERS = 4
+NOTIFICATION_DISPATCH_SYNC = False
+# Bulk sends (e.g. admin moderation) are queued as one task per batch of this size
+NOTIFICATION_DISPATCH_BATCH_SIZE = 100
+
+# Unfiltered admin changelists over bigger tables show an estimated count (mat/admin.py)
+ADMIN_EXACT_COUNT_LIMIT = 100_000
+
+# Largest batch accepted by the offline engagement sync endpoint
+ENGAGEMENT_SYNC_MAX_OPERATIONS = 200
+
+# Post image variants are rendered by a process pool after upload; images
+# stuck longer than IMAGE_PROCESSING_TIMEOUT_MINUTES are retried by the
+# process_post_images command (social/images.py)
+IMAGE_PROCESSING_WORKERS = 2
+IMAGE_PROCESSING_SYNC = False
+IMAGE_PROCESSING_MAX_ATTEMPTS = 3
+IMAGE_PROCESSING_TIMEOUT_MINUTES = 10
+
+# Image uploads are streamed to disk and rejected past these limits before
+# any decoding (mat/uploads.py)
+IMAGE_UPLOAD_MAX_BYTES = 15 * 2 ** 20
+IMAGE_UPLOAD_MAX_PIXELS = 40_000_000
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'WEBP')
+
+# Follow suggestions kept per user by build_follow_suggestions, and the
+# per-batch budget (non-zero scores) that bounds its memory (social/suggestions.py)
+FOLLOW_SUGGESTION_TOP_K = 50
+FOLLOW_SUGGESTION_BATCH_NNZ = 5_000_000
+FOLLOW_SUGGESTION_MAX_POST_ENGAGERS = 1000
+
+
 REST_FRAMEWORK = {
 
     'DEFAULT_AUTHENTICATION_CLASSES': (
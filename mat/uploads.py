@@ -0,0 +1,102 @@
+import hashlib
+import io
+import warnings
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from PIL import Image, UnidentifiedImageError
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+
+MAX_IMAGE_BYTES = getattr(settings, 'IMAGE_UPLOAD_MAX_BYTES', 15 * 2 ** 20)
+MAX_IMAGE_PIXELS = getattr(settings, 'IMAGE_UPLOAD_MAX_PIXELS', 40_000_000)
+IMAGE_FORMATS = getattr(settings, 'IMAGE_UPLOAD_FORMATS', ('JPEG', 'PNG', 'WEBP'))
+# Enough for the dimensions of every supported format, EXIF included
+HEADER_PROBE_BYTES = 256 * 2 ** 10
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Streams every uploaded file to a temporary file in fixed-size chunks,
+    hashing it on the way, so memory use does not depend on the file size.
+    A file is rejected as soon as it passes MAX_IMAGE_BYTES or its header
+    declares a format or pixel count we do not accept. Nothing is decoded.
+    """
+    chunk_size = 64 * 2 ** 10
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.errors = {}
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.digest = hashlib.sha256()
+        self.header = b''
+        self.inspected = False
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > MAX_IMAGE_BYTES:
+            self.reject(f'larger than {MAX_IMAGE_BYTES // 2 ** 20} MB')
+        self.file.write(raw_data)
+        self.digest.update(raw_data)
+
+        if not self.inspected and len(self.header) < HEADER_PROBE_BYTES:
+            self.header += raw_data[:HEADER_PROBE_BYTES - len(self.header)]
+            self.inspected = self.inspect(io.BytesIO(self.header), complete=False)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        if not self.inspected:
+            try:
+                self.inspect(self.file, complete=True)
+            except SkipFile:
+                return None
+            self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.digest.hexdigest()
+        return self.file
+
+    def inspect(self, data, complete):
+        """
+        Read the dimensions from the header. Returns False when more of the
+        file is needed, and rejects the file if it is not an acceptable image.
+        """
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', Image.DecompressionBombWarning)
+                with Image.open(data) as image:
+                    width, height = image.size
+                    image_format = image.format
+        except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+            self.reject('too many pixels')
+        except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+            if complete:
+                self.reject('not a supported image')
+            return False
+
+        if image_format not in IMAGE_FORMATS:
+            self.reject(f'{image_format} images are not supported')
+        if width * height > MAX_IMAGE_PIXELS:
+            self.reject(f'{width}x{height} is more than {MAX_IMAGE_PIXELS // 1_000_000} megapixels')
+        return True
+
+    def reject(self, reason):
+        self.file.close()
+        self.errors.setdefault(self.field_name, []).append(f'{self.file_name}: {reason}.')
+        raise SkipFile()
+
+
+class ImageMultiPartParser(MultiPartParser):
+    """MultiPartParser whose files go through ImageUploadHandler; rejected files are a 400."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        handler = ImageUploadHandler(request._request)
+        request._request.upload_handlers = [handler]
+        data = super().parse(stream, media_type, parser_context)
+        if handler.errors:
+            raise ValidationError(handler.errors)
+        return data
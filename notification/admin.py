@@ -1,18 +1,23 @@
 from django.contrib import admin
+from mat.admin import LargeTableAdmin
 from .models import DeviceToken, Notification
 
 
-class DeviceTokenAdmin(admin.ModelAdmin):
+class DeviceTokenAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'platform', 'deviceName', 'is_active', 'created_at')
+    list_select_related = ('user',)
     list_filter = ('platform', 'is_active')
     search_fields = ('user__username', 'token', 'deviceName')
+    autocomplete_fields = ('user',)
 
 admin.site.register(DeviceToken, DeviceTokenAdmin)
 
 
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'title', 'is_read', 'created_at')
+    list_select_related = ('user',)
     list_filter = ('is_read',)
     search_fields = ('user__username', 'title', 'body')
+    autocomplete_fields = ('user',)
 
 admin.site.register(Notification, NotificationAdmin)
@@ -0,0 +1,81 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, transaction
+from .fcm_utils import send_push_notification
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_WORKERS = getattr(settings, 'NOTIFICATION_DISPATCH_WORKERS', 4)
+DISPATCH_SYNC = getattr(settings, 'NOTIFICATION_DISPATCH_SYNC', False)
+DISPATCH_BATCH_SIZE = getattr(settings, 'NOTIFICATION_DISPATCH_BATCH_SIZE', 100)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DISPATCH_WORKERS, thread_name_prefix='notification')
+    return _executor
+
+
+def deliver(user_id, title, body, data=None):
+    """Send one notification from a worker thread, which owns its own connection."""
+    deliver_batch([(user_id, title, body, data)])
+
+
+def deliver_batch(messages):
+    """
+    Send (user_id, title, body, data) notifications from a worker thread,
+    loading all recipients with one query. A failed message is logged and
+    does not stop the rest of the batch.
+    """
+    try:
+        users = User.objects.in_bulk({user_id for user_id, _, _, _ in messages})
+        for user_id, title, body, data in messages:
+            try:
+                if user_id in users:
+                    send_push_notification(user=users[user_id], title=title, body=body, data=data)
+            except Exception:
+                logger.exception('Could not deliver notification %r to user %s', title, user_id)
+    finally:
+        if not DISPATCH_SYNC:
+            close_old_connections()
+
+
+def dispatch_notification(user_id, title, body, data=None):
+    """
+    Queue a push notification to be sent once the current transaction
+    commits, off the request thread, so FCM latency or outages never reach
+    the caller. Nothing is sent if the transaction rolls back.
+    """
+    def submit():
+        if DISPATCH_SYNC:
+            deliver(user_id, title, body, data)
+        else:
+            get_executor().submit(deliver, user_id, title, body, data)
+
+    transaction.on_commit(submit)
+
+
+def dispatch_notifications(messages):
+    """
+    Queue many (user_id, title, body, data) notifications once the current
+    transaction commits, as one worker task per DISPATCH_BATCH_SIZE of them,
+    so bulk actions do not flood the pool with a task per recipient.
+    """
+    messages = list(messages)
+    if not messages:
+        return
+
+    def submit():
+        for start in range(0, len(messages), DISPATCH_BATCH_SIZE):
+            batch = messages[start:start + DISPATCH_BATCH_SIZE]
+            if DISPATCH_SYNC:
+                deliver_batch(batch)
+            else:
+                get_executor().submit(deliver_batch, batch)
+
+    transaction.on_commit(submit)
@@ -31,6 +31,10 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notification_user_recent_idx'),
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notification_unread_idx'),
+        ]
 
     def __str__(self):
         return f"Notification to {self.user.username}: {self.title[:30]}"
\ No newline at end of file
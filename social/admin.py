@@ -1,22 +1,47 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from mat.admin import LargeTableAdmin
 from .models import Category, Occasion, Post, PostImage, Comment, Wishlist
+from .moderation import moderate_posts
 # Register your models here.
 
 class PostImageInline(admin.TabularInline):
     model = PostImage
     extra = 1
 
-class PostAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'content', 'category', 'occasion', 'target_category', 'created_at', 'total_likes', 'total_comments', 'approval')
+
+@admin.action(description="Approve selected posts")
+def approve_posts(modeladmin, request, queryset):
+    changed = moderate_posts(queryset, approval=True)
+    modeladmin.message_user(request, f"Approved {changed} posts.", messages.SUCCESS)
+
+
+@admin.action(description="Reject selected posts")
+def reject_posts(modeladmin, request, queryset):
+    changed = moderate_posts(queryset, approval=False)
+    modeladmin.message_user(request, f"Rejected {changed} posts.", messages.SUCCESS)
+
+
+class PostAdmin(LargeTableAdmin):
+    # Counters are the stored columns, so rows cost no extra queries
+    list_display = ('id', 'user', 'content', 'category', 'occasion', 'target_category', 'created_at', 'like_count', 'comment_count', 'wishlist_count', 'approval')
+    list_select_related = ('user', 'category', 'occasion')
     search_fields = ('content',)
-    list_filter = ('category', 'occasion', 'target_category')
+    list_filter = ('approval', 'category', 'occasion', 'target_category')
+    autocomplete_fields = ('user', 'category', 'occasion')
+    exclude = ('likes',)
+    readonly_fields = ('like_count', 'comment_count', 'wishlist_count', 'views')
+    actions = [approve_posts, reject_posts]
     inlines = [PostImageInline]
 admin.site.register(Post, PostAdmin)
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = (
         'id', 'post', 'user', 'content', 'created_at'
     )
+    list_select_related = ('post', 'user')
+    search_fields = ('=post__id', 'user__username')
+    raw_id_fields = ('post',)
+    autocomplete_fields = ('user',)
 admin.site.register(Comment, CommentAdmin)
 
 class OccasionAdmin(admin.ModelAdmin):
@@ -26,18 +51,23 @@ class OccasionAdmin(admin.ModelAdmin):
 admin.site.register(Occasion, OccasionAdmin)
 
 
-class PostImageAdmin(admin.ModelAdmin):
-    list_display = ('id', 'post', 'image')
+class PostImageAdmin(LargeTableAdmin):
+    list_display = ('id', 'post', 'image', 'processing_status')
+    list_select_related = ('post',)
+    list_filter = ('processing_status',)
+    raw_id_fields = ('post',)
 admin.site.register(PostImage, PostImageAdmin)
 
-class WishlistAdmin(admin.ModelAdmin):
+class WishlistAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'post', 'created_at')
-    search_fields = ('user', 'post')
-    list_filter = ('user', 'post')
+    list_select_related = ('user', 'post')
+    search_fields = ('user__username', '=post__id')
+    raw_id_fields = ('post',)
+    autocomplete_fields = ('user',)
 admin.site.register(Wishlist, WishlistAdmin)
 
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('id', 'name')
     search_fields = ('name',)
     list_filter = ('name',)
-admin.site.register(Category, CategoryAdmin)
\ No newline at end of file
+admin.site.register(Category, CategoryAdmin)
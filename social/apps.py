@@ -1,6 +1,14 @@
+import atexit
 from django.apps import AppConfig
 
 
 class SocialConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'social'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .impressions import view_buffer
+        view_buffer.start()
+        # Views still buffered at shutdown are written on the way out
+        atexit.register(view_buffer.stop)
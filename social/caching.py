@@ -0,0 +1,92 @@
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+CONTENT_VERSION_KEY = 'social:content-version'
+CONTENT_MODIFIED_KEY = 'social:content-modified'
+RESPONSE_CACHE_TIMEOUT = getattr(settings, 'SOCIAL_RESPONSE_CACHE_TIMEOUT', 60 * 60)
+
+
+def content_version():
+    """
+    A counter bumped by every write that can change a public post response.
+    It starts from the clock so a flushed cache never reuses old versions.
+    """
+    version = cache.get(CONTENT_VERSION_KEY)
+    if version is None:
+        cache.add(CONTENT_VERSION_KEY, int(time.time() * 1000), None)
+        cache.add(CONTENT_MODIFIED_KEY, int(time.time()), None)
+        version = cache.get(CONTENT_VERSION_KEY)
+    return version
+
+
+def content_modified():
+    return cache.get(CONTENT_MODIFIED_KEY) or int(time.time())
+
+
+def bump_content_version():
+    try:
+        cache.incr(CONTENT_VERSION_KEY)
+    except ValueError:
+        content_version()
+    cache.set(CONTENT_MODIFIED_KEY, int(time.time()), None)
+
+
+def request_fingerprint(request):
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    )
+    raw = f'{request.scheme}://{request.get_host()}{request.path}?{urlencode(params)}'
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def versioned_cache(scope):
+    """
+    Cache a GET handler's response data under the normalized query string and
+    the current content version, so any write invalidates it immediately.
+    Responses carry an ETag/Last-Modified pair and matching conditional
+    requests get a 304 without touching the database.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            version = content_version()
+            fingerprint = request_fingerprint(request)
+            # Viewer flags are added outside the cache, so the validator is per user
+            viewer = hashlib.sha1(f'{fingerprint}:{request.user.pk}'.encode()).hexdigest()
+            etag = f'W/"{version}-{viewer[:16]}"'
+            modified = content_modified()
+
+            if_none_match = request.headers.get('If-None-Match')
+            if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+            if (if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]) or (
+                not if_none_match and if_modified_since and if_modified_since >= modified
+            ):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                key = f'social:response:{scope}:{version}:{fingerprint}'
+                data = cache.get(key)
+                if data is None:
+                    response = view_method(self, request, *args, **kwargs)
+                    if response.status_code != status.HTTP_200_OK:
+                        return response
+                    cache.set(key, response.data, RESPONSE_CACHE_TIMEOUT)
+                else:
+                    response = Response(data)
+
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(modified)
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ('Authorization', 'Cookie'))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,191 @@
+from collections import Counter, defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from notification.dispatch import dispatch_notification
+from .caching import bump_content_version
+from .models import Post, Comment, Wishlist
+from .recommendations import record_engagement, record_engagements
+
+Like = Post.likes.through
+
+STATE_KEYS = {'like': 'liked', 'wishlist': 'wishlisted'}
+NOTIFICATION_VERBS = {
+    'like': ('New Like', 'liked'),
+    'wishlist': ('New Wishlist', 'wishlisted'),
+    'comment': ('New Comment', 'commented on'),
+}
+
+
+def count_subquery(queryset):
+    counts = queryset.order_by().values('post_id').annotate(total=Count('*')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def engagement_counters():
+    """Expressions recomputing every stored counter of a post from its rows."""
+    return {
+        'like_count': count_subquery(Like.objects.filter(post_id=OuterRef('pk'))),
+        'comment_count': count_subquery(Comment.objects.filter(post_id=OuterRef('pk'))),
+        'wishlist_count': count_subquery(Wishlist.objects.filter(post_id=OuterRef('pk'))),
+    }
+
+
+def _toggle(relation, counter, kind, post, user_id, active=None, stale=False):
+    """
+    Flip (or, with `active`, set) one user's row in `relation` for `post`.
+
+    The state change is decided by the row count of a single DELETE or the
+    unique constraint on INSERT, never by a prior read, so double taps and
+    concurrent requests cannot both apply. Returns the new state and
+    whether anything changed.
+    """
+    lookup = {'post_id': post.id, 'user_id': user_id}
+    with transaction.atomic():
+        removed = False
+        if active is not True:
+            removed = relation.objects.filter(**lookup).delete()[0] > 0
+        added = False
+        if not removed and active is not False:
+            try:
+                with transaction.atomic():
+                    relation.objects.create(**lookup)
+                added = True
+            except IntegrityError:
+                pass
+
+        changed = added or removed
+        if changed:
+            updates = {counter: F(counter) + (1 if added else -1)}
+            if stale:
+                updates['trending_stale'] = True
+            Post.objects.filter(id=post.id).update(**updates)
+            record_engagement(user_id, post, kind, undo=removed)
+            # Writes to the auto-created likes table send no model signals,
+            # so cached responses (counts, is_liked) are invalidated here
+            transaction.on_commit(bump_content_version)
+        count = Post.objects.filter(id=post.id).values_list(counter, flat=True).first()
+
+    # Nothing changed only if the row was already in the requested state
+    state = added or (not removed and active is not False)
+    return state, changed, count
+
+
+def toggle_like(post, user_id, liked=None):
+    return _toggle(Like, 'like_count', 'like', post, user_id, active=liked, stale=True)
+
+
+def toggle_wishlist(post, user_id, wishlisted=None):
+    return _toggle(Wishlist, 'wishlist_count', 'wishlist', post, user_id, active=wishlisted)
+
+
+def sync_engagement(user, operations):
+    """
+    Apply validated offline operations (like/unlike, wishlist/unwishlist and
+    comment) in one transaction and return one result per operation, in
+    order. Likes and wishlists converge on the last state requested for each
+    post and comments are keyed by client_id, so replaying a batch is a
+    no-op. Writes are bulk inserts/deletes; the touched posts' counters are
+    recomputed in one UPDATE and each post owner gets a single notification.
+    """
+    posts = Post.objects.only('id', 'user_id', 'category_id', 'occasion_id', 'target_category').in_bulk(
+        {operation['post'] for operation in operations}
+    )
+    results = {}
+    wanted = {'like': {}, 'wishlist': {}}
+    comments = []
+    for operation in operations:
+        if operation['post'] not in posts:
+            results[operation['client_id']] = {'status': 'error', 'error': 'Post not found'}
+        elif operation['type'] == 'comment':
+            comments.append(operation)
+        else:
+            kind = operation['type'].removeprefix('un')
+            wanted[kind][operation['post']] = not operation['type'].startswith('un')
+
+    changes = []
+    with transaction.atomic():
+        changed = {'like': set(), 'wishlist': set()}
+        for kind, relation in (('like', Like), ('wishlist', Wishlist)):
+            if not wanted[kind]:
+                continue
+            current = set(
+                relation.objects.filter(user_id=user.id, post_id__in=wanted[kind]).values_list('post_id', flat=True)
+            )
+            added = [post_id for post_id, on in wanted[kind].items() if on and post_id not in current]
+            removed = [post_id for post_id, on in wanted[kind].items() if not on and post_id in current]
+            if removed:
+                relation.objects.filter(user_id=user.id, post_id__in=removed).delete()
+            if added:
+                relation.objects.bulk_create(
+                    [relation(user_id=user.id, post_id=post_id) for post_id in added], ignore_conflicts=True,
+                )
+            changed[kind] = set(added) | set(removed)
+            changes += [(posts[post_id], kind, False) for post_id in added]
+            changes += [(posts[post_id], kind, True) for post_id in removed]
+
+        existing = dict(
+            Comment.objects.filter(user=user, client_id__in=[operation['client_id'] for operation in comments])
+            .values_list('client_id', 'id')
+        )
+        new_comments = {}
+        for operation in comments:
+            if operation['client_id'] not in existing:
+                new_comments.setdefault(operation['client_id'], Comment(
+                    post_id=operation['post'], user=user, content=operation['content'], client_id=operation['client_id'],
+                ))
+        created = Comment.objects.bulk_create(list(new_comments.values()))
+        changes += [(posts[comment.post_id], 'comment', False) for comment in created]
+
+        touched = {post.id for post, _, _ in changes}
+        if touched:
+            Post.objects.filter(id__in=touched).update(**engagement_counters(), trending_stale=True)
+            # New comments change the preview in the cached card fragments
+            Post.objects.filter(id__in={comment.post_id for comment in created}).update(cache_version=F('cache_version') + 1)
+            record_engagements(user.id, changes)
+            transaction.on_commit(bump_content_version)
+            notify_owners(user, changes)
+
+    for operation in operations:
+        client_id = operation['client_id']
+        if client_id in results:
+            continue
+        if operation['type'] == 'comment':
+            comment_id = existing.get(client_id) or new_comments[client_id].id
+            results[client_id] = {
+                'status': 'unchanged' if client_id in existing else 'applied',
+                'comment_id': comment_id,
+            }
+        else:
+            kind = operation['type'].removeprefix('un')
+            results[client_id] = {
+                'status': 'applied' if operation['post'] in changed[kind] else 'unchanged',
+                STATE_KEYS[kind]: wanted[kind][operation['post']],
+            }
+    return [{'client_id': operation['client_id'], **results[operation['client_id']]} for operation in operations]
+
+
+def notify_owners(user, changes):
+    """Queue one notification per post owner summarising a batch of new engagement."""
+    activity = defaultdict(Counter)
+    for post, kind, undo in changes:
+        if not undo and post.user_id != user.id:
+            activity[post.user_id][kind, post.id] += 1
+
+    for owner_id, counts in activity.items():
+        if len(counts) == 1:
+            (kind, post_id), = counts
+            title, verb = NOTIFICATION_VERBS[kind]
+            dispatch_notification(owner_id, title=title, body=f"{user.username} {verb} your post.",
+                                  data={"type": kind, "post_id": str(post_id)})
+            continue
+
+        per_kind = Counter(kind for kind, _ in counts)
+        parts = []
+        for kind, (_, verb) in NOTIFICATION_VERBS.items():
+            if per_kind[kind] == 1:
+                parts.append(f"{verb} a post of yours")
+            elif per_kind[kind]:
+                parts.append(f"{verb} {per_kind[kind]} of your posts")
+        dispatch_notification(owner_id, title="New Activity", body=f"{user.username} {', '.join(parts)}.",
+                              data={"type": "activity", "post_ids": ','.join(sorted({str(post_id) for _, post_id in counts}))})
@@ -0,0 +1,74 @@
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from .models import Post, Category, Occasion
+
+FACETS_CACHE_KEY = 'social:facets'
+FACETS_TIMEOUT = 60 * 60
+
+
+def facet_cube():
+    """
+    Approved post counts grouped by (category, occasion, target) in a single
+    aggregation, cached until a post is approved, unapproved, edited or
+    deleted, or a category/occasion changes.
+    """
+    cube = cache.get(FACETS_CACHE_KEY)
+    if cube is None:
+        rows = (
+            Post.objects.filter(approval=True)
+            .values_list('category_id', 'occasion_id', 'target_category')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        cube = {
+            'rows': list(rows),
+            'categories': dict(Category.objects.values_list('id', 'name')),
+            'occasions': dict(Occasion.objects.values_list('id', 'name')),
+        }
+        cache.set(FACETS_CACHE_KEY, cube, FACETS_TIMEOUT)
+    return cube
+
+
+def invalidate_facets():
+    # After commit, so a concurrent request cannot cache a cube built from
+    # the rows as they were before this transaction
+    transaction.on_commit(lambda: cache.delete(FACETS_CACHE_KEY))
+
+
+def compute_facets(category=None, occasion=None, target=None):
+    """
+    Count approved posts per category, occasion and target. Each facet is
+    narrowed by the other active filters but not by its own, so the client
+    can show how many posts every alternative value would return.
+    """
+    cube = facet_cube()
+    counts = {'category': defaultdict(int), 'occasion': defaultdict(int), 'target': defaultdict(int)}
+
+    for category_id, occasion_id, target_value, total in cube['rows']:
+        category_ok = category is None or category_id == category
+        occasion_ok = occasion is None or occasion_id == occasion
+        target_ok = target is None or target_value == target
+
+        if occasion_ok and target_ok and category_id is not None:
+            counts['category'][category_id] += total
+        if category_ok and target_ok and occasion_id is not None:
+            counts['occasion'][occasion_id] += total
+        if category_ok and occasion_ok:
+            counts['target'][target_value] += total
+
+    return {
+        'category': [
+            {'id': pk, 'name': cube['categories'].get(pk), 'count': total}
+            for pk, total in sorted(counts['category'].items())
+        ],
+        'occasion': [
+            {'id': pk, 'name': cube['occasions'].get(pk), 'count': total}
+            for pk, total in sorted(counts['occasion'].items())
+        ],
+        'target': [
+            {'value': value, 'count': total}
+            for value, total in sorted(counts['target'].items())
+        ],
+    }
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from authentication.cards import get_user_cards
+from .hydration import hydrate_cards
+from .models import Post
+from .serializers import PostCardSerializer
+
+FRAGMENT_TIMEOUT = getattr(settings, 'SOCIAL_FRAGMENT_CACHE_TIMEOUT', 24 * 60 * 60)
+
+# Card fields read from the page rows on every request instead of the fragment,
+# so engagement and view counts never invalidate it
+LIVE_FIELDS = {
+    'likes_count': 'like_count',
+    'comments_count': 'comment_count',
+    'wishlist_count': 'wishlist_count',
+    'views': 'views',
+}
+
+
+def fragment_key(post):
+    return f'social:card:{post.id}:{post.cache_version}'
+
+
+def touch_posts(**filters):
+    """Invalidate the card fragments of the matching posts."""
+    return Post.objects.filter(**filters).update(cache_version=F('cache_version') + 1)
+
+
+def render_cards(posts):
+    """
+    Serialized cards for `posts`, in order. Fragments come from one cache
+    multi-get keyed by (post id, cache_version); only the misses are
+    hydrated, in one batch, and serialized. Live counters are then
+    overlaid from the rows the page query already loaded, and nested users
+    from one multi-get of the user-card cache.
+    """
+    keys = {post.id: fragment_key(post) for post in posts}
+    fragments = cache.get_many(list(keys.values()))
+
+    misses = [post for post in posts if keys[post.id] not in fragments]
+    if misses:
+        hydrate_cards(misses)
+    user_ids = {post.user_id for post in posts}
+    user_ids.update(comment.user_id for post in misses for comment in post.preview_comments)
+    user_ids.update(comment['user']['id'] for fragment in fragments.values() for comment in fragment['comments'])
+    users = get_user_cards(user_ids)
+
+    if misses:
+        serializer = PostCardSerializer(misses, many=True, context={'user_cards': users})
+        fresh = {keys[post.id]: dict(card) for post, card in zip(misses, serializer.data)}
+        cache.set_many(fresh, FRAGMENT_TIMEOUT)
+        fragments.update(fresh)
+
+    cards = []
+    for post in posts:
+        card = dict(fragments[keys[post.id]])
+        for field, attribute in LIVE_FIELDS.items():
+            card[field] = getattr(post, attribute)
+        card['user'] = users.get(post.user_id)
+        card['profile'] = card['user']['avatar'] if card['user'] else None
+        card['comments'] = [
+            {**comment, 'user': users.get(comment['user']['id'], comment['user'])}
+            for comment in card['comments']
+        ]
+        cards.append(card)
+    return cards
+
+
+def select_fields(cards, fields):
+    """Apply a sparse ?fields= list to assembled cards."""
+    if not fields:
+        return cards
+    return [{name: value for name, value in card.items() if name in fields} for card in cards]
@@ -0,0 +1,127 @@
+from functools import wraps
+from django.db.models import F, Window, prefetch_related_objects
+from django.db.models.functions import RowNumber
+from rest_framework import status
+from .models import Post, Comment, Wishlist
+
+COMMENT_PREVIEW_SIZE = 3
+# Expanded posts show this many comments; the rest of the thread is paginated
+COMMENT_EXPAND_SIZE = 20
+VIEWER_FLAGS = ('is_liked', 'is_wishlisted', 'is_following_author')
+
+
+def comment_previews(posts, size, to_attr):
+    """
+    Attach the newest `size` comments of every post to `to_attr` with one
+    query: ROW_NUMBER() OVER (PARTITION BY post_id ORDER BY created_at DESC,
+    id DESC), kept while <= size. The ranking is an index-only read of
+    comment_thread_idx, and only the surviving rows are loaded.
+    """
+    posts = list(posts)
+    previews = {post.id: [] for post in posts}
+    if previews:
+        ranked = (
+            Comment.objects.filter(post_id__in=previews)
+            .annotate(rank=Window(
+                RowNumber(),
+                partition_by=[F('post_id')],
+                order_by=[F('created_at').desc(), F('id').desc()],
+            ))
+            .filter(rank__lte=size)
+            .values('id')
+        )
+        # Ranking only touches the covering index; the bodies are read for the
+        # few rows that survive and the authors come from the user-card cache
+        comments = Comment.objects.filter(id__in=ranked)
+        for comment in sorted(comments, key=lambda c: (c.created_at, c.id), reverse=True):
+            previews[comment.post_id].append(comment)
+    for post in posts:
+        setattr(post, to_attr, previews[post.id])
+    return posts
+
+
+def hydrate_posts(posts, expand=()):
+    """
+    Batch-load images, plus liker ids and the newest COMMENT_EXPAND_SIZE
+    comments when they are expanded, for already evaluated posts. The number
+    of queries is fixed regardless of how many posts there are.
+    """
+    prefetch_related_objects(posts, 'images')
+    if 'likes' in expand:
+        likers = {post.id: [] for post in posts}
+        for post_id, user_id in Post.likes.through.objects.filter(post_id__in=likers).order_by('user_id').values_list('post_id', 'user_id'):
+            likers[post_id].append(user_id)
+        for post in posts:
+            post.liker_ids = likers[post.id]
+    if 'comments' in expand:
+        comment_previews(posts, COMMENT_EXPAND_SIZE, 'prefetched_comments')
+    return posts
+
+
+def hydrate_cards(posts):
+    """
+    Batch-load what PostCardSerializer needs for a page: images and the
+    newest COMMENT_PREVIEW_SIZE comments of each post.
+    """
+    prefetch_related_objects(posts, 'images')
+    comment_previews(posts, COMMENT_PREVIEW_SIZE, 'preview_comments')
+    return posts
+
+
+def related_user_ids(posts):
+    """Ids of every user nested in the hydrated posts: authors, likers and commenters."""
+    user_ids = set()
+    for post in posts:
+        user_ids.add(post.user_id)
+        user_ids.update(getattr(post, 'liker_ids', ()))
+        for attr in ('preview_comments', 'prefetched_comments'):
+            user_ids.update(comment.user_id for comment in getattr(post, attr, ()))
+    return user_ids
+
+
+def viewer_flags(user, post_ids, flags=VIEWER_FLAGS):
+    """
+    Map each requested flag to the subset of `post_ids` it is true for, with
+    one set-membership query per flag whatever the page size.
+    """
+    if not user.is_authenticated or not post_ids:
+        return {flag: set() for flag in flags}
+    queries = {
+        'is_liked': lambda: Post.likes.through.objects.filter(user_id=user.id, post_id__in=post_ids)
+        .values_list('post_id', flat=True),
+        'is_wishlisted': lambda: Wishlist.objects.filter(user_id=user.id, post_id__in=post_ids)
+        .values_list('post_id', flat=True),
+        'is_following_author': lambda: Post.objects.filter(id__in=post_ids, user__profile__followers__user_id=user.id)
+        .values_list('id', flat=True),
+    }
+    return {flag: set(queries[flag]()) for flag in flags}
+
+
+def add_viewer_state(items, request, fields=()):
+    """Set the viewer flags on serialized posts, honouring a sparse `fields` list."""
+    flags = [flag for flag in VIEWER_FLAGS if not fields or flag in fields]
+    post_ids = [item['id'] for item in items if 'id' in item]
+    if not flags or not post_ids:
+        return items
+    matches = viewer_flags(request.user, post_ids, flags)
+    for item in items:
+        for flag in flags:
+            item[flag] = item.get('id') in matches[flag]
+    return items
+
+
+def with_viewer_state(view_method):
+    """
+    Add the requesting user's flags to a post or a page of `results` after
+    the handler runs. Apply it outside `versioned_cache`, whose cached data
+    is shared by every viewer.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and isinstance(response.data, dict):
+            fields = [name.strip() for name in request.query_params.get('fields', '').split(',') if name.strip()]
+            items = response.data['results'] if 'results' in response.data else [response.data]
+            add_viewer_state(items, request, fields)
+        return response
+    return wrapper
@@ -0,0 +1,208 @@
+import base64
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+from .caching import bump_content_version
+from .models import Post, PostImage
+
+logger = logging.getLogger(__name__)
+
+# Longest edge of each variant; originals are never upscaled
+VARIANT_SIZES = {'thumb': 160, 'card': 640, 'full': 1600}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+PLACEHOLDER_SIZE = 8
+
+PROCESSING_WORKERS = getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2)
+PROCESSING_SYNC = getattr(settings, 'IMAGE_PROCESSING_SYNC', False)
+MAX_ATTEMPTS = getattr(settings, 'IMAGE_PROCESSING_MAX_ATTEMPTS', 3)
+STALE_AFTER = timedelta(minutes=getattr(settings, 'IMAGE_PROCESSING_TIMEOUT_MINUTES', 10))
+
+_pool = None
+_coordinator = None
+
+
+def render_variants(data):
+    """
+    Decode an original and encode every variant plus the placeholder. Runs in
+    a worker process, so it only deals in bytes and never touches Django.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+
+    variants = {}
+    for name, size in VARIANT_SIZES.items():
+        variant = image.copy()
+        variant.thumbnail((size, size), Image.LANCZOS)
+        encoded = {}
+        for fmt, (pil_format, _, options) in VARIANT_FORMATS.items():
+            buffer = io.BytesIO()
+            variant.save(buffer, pil_format, **options)
+            encoded[fmt] = buffer.getvalue()
+        variants[name] = {'width': variant.width, 'height': variant.height, 'files': encoded}
+
+    tiny = image.copy()
+    tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'WEBP', quality=30)
+    return {
+        'width': image.width,
+        'height': image.height,
+        'placeholder': base64.b64encode(buffer.getvalue()).decode(),
+        'variants': variants,
+    }
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PROCESSING_WORKERS)
+    return _pool
+
+
+def reset_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+def render(data):
+    """Render in the process pool, replacing the pool if a worker dies."""
+    if PROCESSING_SYNC:
+        return render_variants(data)
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return get_pool().submit(render_variants, data).result()
+        except BrokenProcessPool:
+            logger.warning('Image worker crashed, restarting the pool (attempt %d)', attempt + 1)
+            reset_pool()
+    raise BrokenProcessPool('Image workers keep crashing')
+
+
+def process_image(image_id):
+    """
+    Claim one unprocessed image, render it and store the variants next to
+    the original. Returns True once the image is ready. Failures leave it
+    pending until MAX_ATTEMPTS, then mark it failed.
+    """
+    claimed = PostImage.objects.filter(id=image_id, processing_attempts__lt=MAX_ATTEMPTS).exclude(
+        processing_status='ready'
+    ).update(processing_started_at=timezone.now(), processing_attempts=F('processing_attempts') + 1)
+    if not claimed:
+        return False
+
+    image = PostImage.objects.get(id=image_id)
+    try:
+        with image.image.open('rb') as original:
+            result = render(original.read())
+
+        base = os.path.splitext(image.image.name)[0]
+        variants = {}
+        for name, variant in result['variants'].items():
+            variants[name] = {'width': variant['width'], 'height': variant['height']}
+            for fmt, content in variant['files'].items():
+                extension = VARIANT_FORMATS[fmt][1]
+                variants[name][fmt] = default_storage.save(f'{base}_{name}.{extension}', ContentFile(content))
+    except Exception:
+        logger.exception('Could not process post image %s', image_id)
+        PostImage.objects.filter(id=image_id, processing_attempts__gte=MAX_ATTEMPTS).update(processing_status='failed')
+        return False
+
+    PostImage.objects.filter(id=image_id).update(
+        width=result['width'],
+        height=result['height'],
+        placeholder=result['placeholder'],
+        variants=variants,
+        processing_status='ready',
+    )
+    Post.objects.filter(id=image.post_id).update(cache_version=F('cache_version') + 1)
+    bump_content_version()
+    return True
+
+
+def create_post_images(uploads):
+    """
+    Store the (post, file) pairs and insert their PostImage rows with one
+    statement. Files already written are deleted again if that fails.
+    """
+    images = [
+        PostImage(post=post, image=upload, checksum=getattr(upload, 'sha256', ''))
+        for post, upload in uploads
+    ]
+    if not images:
+        return []
+    try:
+        PostImage.objects.bulk_create(images)
+    except Exception:
+        for image in images:
+            if image.image._committed:
+                image.image.storage.delete(image.image.name)
+        raise
+    return images
+
+
+def _process_all(image_ids):
+    try:
+        for image_id in image_ids:
+            process_image(image_id)
+    finally:
+        if not PROCESSING_SYNC:
+            close_old_connections()
+
+
+def enqueue_images(image_ids):
+    """
+    Process freshly uploaded images once the current transaction commits,
+    off the request thread. Images whose processing never finishes are
+    picked up again by the `process_post_images` command.
+    """
+    image_ids = list(image_ids)
+    if not image_ids:
+        return
+
+    def submit():
+        global _coordinator
+        if PROCESSING_SYNC:
+            _process_all(image_ids)
+            return
+        if _coordinator is None:
+            _coordinator = ThreadPoolExecutor(max_workers=1, thread_name_prefix='images')
+        _coordinator.submit(_process_all, image_ids)
+
+    transaction.on_commit(submit)
+
+
+def unprocessed_images():
+    """Images never processed, interrupted for longer than STALE_AFTER, or due a retry."""
+    return PostImage.objects.filter(
+        ~Q(processing_status='ready'),
+        Q(processing_started_at__isnull=True) | Q(processing_started_at__lt=timezone.now() - STALE_AFTER),
+        processing_attempts__lt=MAX_ATTEMPTS,
+    )
+
+
+def variant_urls(image):
+    """Serialized responsive variants of a ready image, or None while it is processing."""
+    if image.processing_status != 'ready' or not image.variants:
+        return None
+    return {
+        name: {
+            'width': variant['width'],
+            'height': variant['height'],
+            **{fmt: default_storage.url(variant[fmt]) for fmt in VARIANT_FORMATS if fmt in variant},
+        }
+        for name, variant in image.variants.items()
+    }
@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from rest_framework import status
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+VIEW_DEDUPE_SECONDS = getattr(settings, 'POST_VIEW_DEDUPE_SECONDS', 30 * 60)
+VIEW_FLUSH_INTERVAL = getattr(settings, 'POST_VIEW_FLUSH_INTERVAL', 30)
+VIEW_FLUSH_THRESHOLD = getattr(settings, 'POST_VIEW_FLUSH_THRESHOLD', 1000)
+
+
+class ViewBuffer:
+    """
+    In-process tally of post views that have not been written yet. Reads only
+    touch the tally; `flush` turns it into one `views = views + n` UPDATE per
+    distinct n, all in a single transaction. A daemon thread flushes every
+    VIEW_FLUSH_INTERVAL seconds, or as soon as VIEW_FLUSH_THRESHOLD views are
+    buffered, so no request ever pays for the write.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self.last_flush = time.monotonic()
+
+    def add(self, post_ids):
+        with self._lock:
+            self._counts.update(post_ids)
+            full = sum(self._counts.values()) >= VIEW_FLUSH_THRESHOLD
+        if full:
+            self._wake.set()
+
+    def depth(self):
+        with self._lock:
+            return {'posts': len(self._counts), 'views': sum(self._counts.values())}
+
+    def start(self):
+        """Start the flush thread, once per process."""
+        with self._lock:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='post-view-flush', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread and write whatever is still buffered."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+        if thread is not None:
+            self._wake.set()
+            thread.join()
+        return self.flush()
+
+    def _run(self):
+        while True:
+            self._wake.wait(VIEW_FLUSH_INTERVAL)
+            self._wake.clear()
+            if self._stopping:
+                return
+            self.flush()
+            # The thread owns its connection; let CONN_MAX_AGE recycle it
+            close_old_connections()
+
+    def reset(self):
+        with self._lock:
+            self._counts = Counter()
+            self.last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self.last_flush = time.monotonic()
+        if not counts:
+            return 0
+
+        by_increment = defaultdict(list)
+        for post_id, views in counts.items():
+            by_increment[views].append(post_id)
+        try:
+            with transaction.atomic():
+                for views, post_ids in by_increment.items():
+                    Post.objects.filter(id__in=post_ids).update(views=F('views') + views)
+        except Exception:
+            logger.exception('Could not flush %d buffered post views', sum(counts.values()))
+            self.add(counts.elements())
+            return 0
+        return sum(counts.values())
+
+
+view_buffer = ViewBuffer()
+
+
+def viewer_key(request):
+    if request.user.is_authenticated:
+        return f'u{request.user.id}'
+    return f'a{request.META.get("REMOTE_ADDR", "")}'
+
+
+def record_views(request, post_ids):
+    """
+    Buffer one view per post, ignoring posts this viewer already saw within
+    VIEW_DEDUPE_SECONDS. Costs two cache round trips and no queries; the
+    flush thread writes the buffer.
+    """
+    viewer = viewer_key(request)
+    keys = {f'social:viewed:{viewer}:{post_id}': post_id for post_id in post_ids}
+    if not keys:
+        return
+    seen = cache.get_many(keys)
+    fresh = {key: 1 for key in keys if key not in seen}
+    if fresh:
+        cache.set_many(fresh, VIEW_DEDUPE_SECONDS)
+        view_buffer.add(keys[key] for key in fresh)
+
+
+def counts_views(view_method):
+    """
+    Record a view of every post in a successful response, whether it is a
+    single post or a page of `results`. Apply it outside `versioned_cache`
+    so cached responses are counted too.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and isinstance(response.data, dict):
+            if 'results' in response.data:
+                post_ids = [card['id'] for card in response.data['results'] if 'id' in card]
+            else:
+                post_ids = [response.data['id']] if 'id' in response.data else []
+            record_views(request, post_ids)
+        return response
+    return wrapper
@@ -0,0 +1,23 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from social.models import Post
+from social.timeline import fan_out_post
+
+
+class Command(BaseCommand):
+    help = "Fan recent approved posts out to follower home timelines (backfill)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        posts = Post.objects.filter(approval=True, created_at__gte=since).only('id', 'user_id', 'created_at')
+
+        total = 0
+        for post in posts.iterator(chunk_size=500):
+            fan_out_post(post)
+            total += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Fanned out {total} posts."))
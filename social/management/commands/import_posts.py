@@ -0,0 +1,154 @@
+import hashlib
+import json
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from social.caching import bump_content_version
+from social.facets import invalidate_facets
+from social.images import create_post_images
+from social.models import Post, Category, Occasion, TARGET_CATEGORIES
+from social.search import get_search_backend
+from social.timeline import fan_out_post
+from social.trending import trending_score
+
+IMAGE_BATCH_SIZE = 100
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(2 ** 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = "Bulk import posts and their images from a JSONL manifest in chunked transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'manifest',
+            help='JSONL file, one post per line: {"user": "<username>", "content": "...", '
+                 '"target_category": "Women", "category": "<name>", "occasion": "<name>", '
+                 '"amazon_link": "...", "approval": true, "created_at": "<ISO 8601>", "images": ["photo.jpg"]}',
+        )
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--images-dir', default=None, help="Base directory for relative image paths (default: the manifest's directory).")
+        parser.add_argument('--create-tags', action='store_true', help="Create categories and occasions that do not exist yet.")
+
+    def handle(self, *args, **options):
+        manifest = Path(options['manifest'])
+        if not manifest.is_file():
+            raise CommandError(f"Manifest {manifest} does not exist.")
+        self.images_dir = Path(options['images_dir']) if options['images_dir'] else manifest.parent
+        self.create_tags = options['create_tags']
+
+        totals = Counter()
+        chunk = []
+        with manifest.open() as lines:
+            for number, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    chunk.append((number, json.loads(line)))
+                except ValueError as error:
+                    self.stderr.write(f"Line {number}: invalid JSON ({error}), skipped.")
+                    totals['skipped'] += 1
+                if len(chunk) >= options['chunk_size']:
+                    totals.update(self.import_chunk(chunk))
+                    chunk = []
+        if chunk:
+            totals.update(self.import_chunk(chunk))
+
+        if totals['posts']:
+            invalidate_facets()
+            bump_content_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['posts']} posts with {totals['images']} images, skipped {totals['skipped']}. "
+            f"Run process_post_images to render the image variants."
+        ))
+
+    def import_chunk(self, chunk):
+        users = dict(User.objects.filter(username__in={row.get('user') for _, row in chunk}).values_list('username', 'id'))
+        categories = self.tags(Category, {row.get('category') for _, row in chunk})
+        occasions = self.tags(Occasion, {row.get('occasion') for _, row in chunk})
+        targets = dict(TARGET_CATEGORIES)
+
+        posts, uploads, skipped = [], [], 0
+        for number, row in chunk:
+            error = None
+            paths = [self.images_dir / path for path in row.get('images', [])]
+            created_at = parse_datetime(row['created_at']) if row.get('created_at') else None
+            if row.get('user') not in users:
+                error = f"unknown user {row.get('user')!r}"
+            elif not row.get('content'):
+                error = "content is required"
+            elif row.get('target_category') not in targets:
+                error = f"target_category must be one of {', '.join(targets)}"
+            elif row.get('category') and row['category'] not in categories:
+                error = f"unknown category {row['category']!r}"
+            elif row.get('occasion') and row['occasion'] not in occasions:
+                error = f"unknown occasion {row['occasion']!r}"
+            elif row.get('created_at') and created_at is None:
+                error = f"invalid created_at {row['created_at']!r}"
+            elif any(not path.is_file() for path in paths):
+                error = "missing image " + ', '.join(str(path) for path in paths if not path.is_file())
+            if error:
+                self.stderr.write(f"Line {number}: {error}, skipped.")
+                skipped += 1
+                continue
+
+            post = Post(
+                user_id=users[row['user']],
+                content=row['content'],
+                target_category=row['target_category'],
+                category_id=categories.get(row.get('category')),
+                occasion_id=occasions.get(row.get('occasion')),
+                amazon_link=row.get('amazon_link') or None,
+                approval=bool(row.get('approval', False)),
+            )
+            post.imported_at = created_at
+            posts.append(post)
+            uploads.extend((post, path) for path in paths)
+
+        if not posts:
+            return {'skipped': skipped}
+
+        with transaction.atomic():
+            Post.objects.bulk_create(posts)
+            # created_at is auto_now_add, so original timestamps are restored afterwards
+            for post in posts:
+                post.created_at = post.imported_at or post.created_at
+                post.trending_score = trending_score(0, 0, post.created_at)
+            Post.objects.bulk_update(posts, ['created_at', 'trending_score'])
+
+            # Bounded batches keep the number of open files small
+            for start in range(0, len(uploads), IMAGE_BATCH_SIZE):
+                with ExitStack() as stack:
+                    files = []
+                    for post, path in uploads[start:start + IMAGE_BATCH_SIZE]:
+                        upload = File(stack.enter_context(open(path, 'rb')), name=path.name)
+                        upload.sha256 = file_checksum(path)
+                        files.append((post, upload))
+                    create_post_images(files)
+
+        # bulk_create skips the post_save side effects of approval
+        approved = [post for post in posts if post.approval]
+        get_search_backend().index_posts([post.id for post in approved])
+        for post in approved:
+            fan_out_post(post)
+        return {'posts': len(posts), 'images': len(uploads), 'skipped': skipped}
+
+    def tags(self, model, names):
+        names = {name for name in names if name}
+        found = dict(model.objects.filter(name__in=names).values_list('name', 'id'))
+        missing = names - set(found)
+        if missing and self.create_tags:
+            model.objects.bulk_create([model(name=name) for name in missing], ignore_conflicts=True)
+            found = dict(model.objects.filter(name__in=names).values_list('name', 'id'))
+        return found
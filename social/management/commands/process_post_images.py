@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from social.images import process_image, unprocessed_images
+
+
+class Command(BaseCommand):
+    help = "Render variants for post images that were never processed or whose processing was interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500)
+
+    def handle(self, *args, **options):
+        image_ids = list(unprocessed_images().order_by('id').values_list('id', flat=True)[:options['limit']])
+        processed = sum(process_image(image_id) for image_id in image_ids)
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} of {len(image_ids)} pending post images."))
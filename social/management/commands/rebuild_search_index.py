@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from social.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the post search index from the approved posts."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search index with {type(backend).__name__}."))
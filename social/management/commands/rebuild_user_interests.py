@@ -0,0 +1,47 @@
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from social.models import Post, Comment, Wishlist, UserInterest
+from social.recommendations import ENGAGEMENT_WEIGHTS
+
+
+class Command(BaseCommand):
+    help = "Rebuild every user's interest profile from their likes, comments and wishlists."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        sources = {
+            'like': Post.likes.through.objects.all(),
+            'comment': Comment.objects.all(),
+            'wishlist': Wishlist.objects.all(),
+        }
+        dimensions = {
+            'category': 'post__category_id',
+            'occasion': 'post__occasion_id',
+            'target': 'post__target_category',
+        }
+
+        weights = defaultdict(float)
+        for kind, queryset in sources.items():
+            for dimension, column in dimensions.items():
+                grouped = (
+                    queryset.exclude(**{f'{column}__isnull': True})
+                    .values_list('user_id', column)
+                    .annotate(total=Count('*'))
+                    .order_by()
+                )
+                for user_id, value, total in grouped:
+                    weights[(user_id, dimension, str(value))] += ENGAGEMENT_WEIGHTS[kind] * total
+
+        with transaction.atomic():
+            UserInterest.objects.all().delete()
+            UserInterest.objects.bulk_create(
+                (UserInterest(user_id=user_id, dimension=dimension, value=value, weight=weight)
+                 for (user_id, dimension, value), weight in weights.items()),
+                batch_size=options['batch_size'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(weights)} interest weights."))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from social.caching import bump_content_version
+from social.engagement import engagement_counters
+from social.models import Post
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored like/comment/wishlist counters on posts to repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        counters = engagement_counters()
+
+        last_id = 0
+        updated = 0
+        while True:
+            ids = list(
+                Post.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                updated += Post.objects.filter(id__gte=ids[0], id__lte=ids[-1]).update(**counters)
+            last_id = ids[-1]
+
+        if updated:
+            bump_content_version()
+        self.stdout.write(self.style.SUCCESS(f"Recomputed engagement counters for {updated} posts."))
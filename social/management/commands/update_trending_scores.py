@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from social.caching import bump_content_version
+from social.models import Post
+from social.trending import trending_score
+
+
+class Command(BaseCommand):
+    help = "Rescore trending for posts that received engagement since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--all', action='store_true', help="Rescore every post, e.g. after changing the half-life.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pending = Post.objects.all() if options['all'] else Post.objects.filter(trending_stale=True)
+
+        last_id = 0
+        updated = 0
+        while True:
+            ids = list(pending.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+
+            with transaction.atomic():
+                # Clear the flag before reading the counters: engagement that
+                # lands after this point flags the post again for the next run.
+                Post.objects.filter(id__in=ids).update(trending_stale=False)
+                posts = list(Post.objects.filter(id__in=ids).only('id', 'like_count', 'comment_count', 'created_at'))
+                for post in posts:
+                    post.trending_score = trending_score(post.like_count, post.comment_count, post.created_at)
+                Post.objects.bulk_update(posts, ['trending_score'], batch_size=batch_size)
+
+            updated += len(posts)
+            last_id = ids[-1]
+
+        if updated:
+            bump_content_version()
+        self.stdout.write(self.style.SUCCESS(f"Updated trending scores for {updated} posts."))
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:00
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model('social', 'Post')
+    Comment = apps.get_model('social', 'Comment')
+    Wishlist = apps.get_model('social', 'Wishlist')
+    Like = Post.likes.through
+
+    def count_subquery(queryset):
+        counts = queryset.order_by().values('post_id').annotate(total=Count('*')).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    Post.objects.update(
+        like_count=count_subquery(Like.objects.filter(post_id=OuterRef('pk'))),
+        comment_count=count_subquery(Comment.objects.filter(post_id=OuterRef('pk'))),
+        wishlist_count=count_subquery(Wishlist.objects.filter(post_id=OuterRef('pk'))),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0002_post_approval'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='wishlist_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
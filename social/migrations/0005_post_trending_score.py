@@ -0,0 +1,44 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def flag_existing_posts(apps, schema_editor):
+    # Let the first update_trending_scores run score the existing posts
+    Post = apps.get_model('social', 'Post')
+    Post.objects.update(trending_stale=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0004_timelineentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='trending_stale',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(flag_existing_posts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['approval', '-trending_score', '-id'], name='post_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['target_category', 'approval', '-trending_score', '-id'], name='post_target_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('trending_stale', True)), fields=['id'], name='post_trending_stale_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:00
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('social', 'Post')
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS social_post_search USING fts5("
+        "content, category, occasion, target, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    rows = Post.objects.filter(approval=True).values_list(
+        'id', 'content', 'category__name', 'occasion__name', 'target_category'
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO social_post_search (rowid, content, category, occasion, target) VALUES (%s, %s, %s, %s, %s)",
+            [(post_id, content, category or '', occasion or '', target or '')
+             for post_id, content, category, occasion, target in rows.iterator()],
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS social_post_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0006_userinterest'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0010_postimage_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postimage',
+            name='checksum',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from .trending import trending_score
 
 # Create your models here.
 class Category(models.Model):
@@ -28,22 +30,87 @@ class Post(models.Model):
     likes = models.ManyToManyField(User, related_name='liked_posts', blank=True)
     comments = models.ManyToManyField(User, through='Comment', related_name='commented_posts', blank=True)
     views = models.PositiveIntegerField(default=0)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    wishlist_count = models.PositiveIntegerField(default=0)
+    trending_score = models.FloatField(default=0)
+    # Set by every engagement write; cleared by update_trending_scores
+    trending_stale = models.BooleanField(default=False)
+    # Bumped whenever the cached card fragment of the post goes stale (social/fragments.py)
+    cache_version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     approval = models.BooleanField(default=False)
 
+    class Meta:
+        # Partial indexes over approved posts. SQLite renders approval=True as a
+        # bare column test, which only a matching partial index can serve.
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(approval=True), name='post_feed_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], condition=models.Q(approval=True), name='post_category_feed_idx'),
+            models.Index(fields=['occasion', '-created_at', '-id'], condition=models.Q(approval=True), name='post_occasion_feed_idx'),
+            models.Index(fields=['target_category', '-created_at', '-id'], condition=models.Q(approval=True), name='post_target_feed_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], condition=models.Q(approval=True), name='post_author_feed_idx'),
+            models.Index(fields=['-trending_score', '-id'], condition=models.Q(approval=True), name='post_approved_trending_idx'),
+            models.Index(fields=['target_category', '-trending_score', '-id'], condition=models.Q(approval=True), name='post_target_hot_idx'),
+            models.Index(fields=['id'], condition=models.Q(trending_stale=True), name='post_trending_stale_idx'),
+        ]
+
     def __str__(self):
         return self.content[:50]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.trending_score:
+            self.trending_score = trending_score(self.like_count, self.comment_count, timezone.now())
+        elif not self._state.adding:
+            # Increment the stored version, which comments and images may have
+            # bumped since this instance was loaded
+            self.cache_version = models.F('cache_version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'cache_version'}
+        super().save(*args, **kwargs)
+        if isinstance(self.cache_version, models.Expression):
+            # Deferred, so the new value is read back only when needed
+            del self.cache_version
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored approval so post_save can detect the transition
+        if 'approval' in field_names:
+            instance._loaded_approval = instance.approval
+        return instance
     
     def total_likes(self):
-        return self.likes.count()
+        return self.like_count
 
     def total_comments(self):
-        return self.comments.count()
+        return self.comment_count
     
     
 class PostImage(models.Model):
+    PROCESSING_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='post_images/')
+    # SHA-256 of the original, computed while the upload streams in
+    checksum = models.CharField(max_length=64, blank=True)
+    # Filled in by the background pipeline in social/images.py
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    placeholder = models.CharField(max_length=255, blank=True)
+    variants = models.JSONField(default=dict, blank=True)
+    processing_status = models.CharField(max_length=10, choices=PROCESSING_CHOICES, default='pending')
+    processing_attempts = models.PositiveSmallIntegerField(default=0)
+    processing_started_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['processing_started_at'], condition=~models.Q(processing_status='ready'), name='postimage_unprocessed_idx'),
+        ]
 
     def __str__(self):
         return f"Image for post {self.post.id}"
@@ -53,6 +120,16 @@ class Comment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comment_user')
     content = models.TextField(max_length=500)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set by offline clients so a replayed comment is only stored once
+    client_id = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', '-created_at', '-id'], name='comment_thread_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_id'], name='comment_client_id_unique'),
+        ]
 
     def __str__(self):
         return f"Comment by {self.user.username} on post {self.post.id}"
@@ -65,6 +142,62 @@ class Wishlist(models.Model):
 
     class Meta:
         unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='wishlist_user_recent_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} wishlisted post {self.post.id}"
\ No newline at end of file
+        return f"{self.user.username} wishlisted post {self.post.id}"
+
+
+class TimelineEntry(models.Model):
+    """A post fanned out to one follower's home timeline."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='timeline_user_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} in timeline of user {self.user_id}"
+
+
+
+class UserInterest(models.Model):
+    """Weighted engagement of a user with one category, occasion or target."""
+    DIMENSIONS = [
+        ('category', 'Category'),
+        ('occasion', 'Occasion'),
+        ('target', 'Target'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='interests')
+    dimension = models.CharField(max_length=10, choices=DIMENSIONS)
+    value = models.CharField(max_length=100)
+    weight = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'dimension', 'value')
+
+    def __str__(self):
+        return f"{self.user_id} {self.dimension}={self.value} ({self.weight})"
+
+
+class FollowSuggestion(models.Model):
+    """
+    Precomputed "people you may know" for one user, best first, upserted
+    batch by batch by the build_follow_suggestions command. One row per user
+    so the endpoint reads it with a primary-key lookup.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='follow_suggestions')
+    suggested_ids = models.JSONField(default=list)
+    scores = models.JSONField(default=list)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{len(self.suggested_ids)} follow suggestions for user {self.user_id}"
+
@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.db.models import F
+from notification.dispatch import dispatch_notifications
+from .caching import bump_content_version
+from .facets import invalidate_facets
+from .models import Post
+from .search import get_search_backend
+from . import timeline
+
+MODERATION_MESSAGES = {
+    True: ("Post approved", "Your post is now live."),
+    False: ("Post not approved", "Your post was not approved by our moderators."),
+}
+
+
+def moderate_posts(queryset, approval):
+    """
+    Approve or reject the posts in `queryset` with one UPDATE. A queryset
+    update sends no post_save, so the approval side effects of
+    signals.handle_post_approval are applied here for the posts whose state
+    changes. Pending and rejected posts are both unapproved, so rejecting
+    only changes approved posts, but every selected author is told. Returns
+    the number of posts approved or rejected.
+    """
+    with transaction.atomic():
+        posts = list(queryset.select_related(None).only('id', 'user_id', 'created_at', 'approval'))
+        changed = [post for post in posts if post.approval != approval]
+        post_ids = [post.id for post in changed]
+        if changed:
+            Post.objects.filter(id__in=post_ids).update(approval=approval, cache_version=F('cache_version') + 1)
+            if approval:
+                get_search_backend().index_posts(post_ids)
+                transaction.on_commit(lambda: [timeline.fan_out_post(post) for post in changed])
+            else:
+                get_search_backend().remove_posts(post_ids)
+                timeline.retract_posts(post_ids)
+            invalidate_facets()
+            transaction.on_commit(bump_content_version)
+
+        moderated = changed if approval else posts
+        title, body = MODERATION_MESSAGES[approval]
+        dispatch_notifications(
+            (post.user_id, title, body, {'type': 'moderation', 'post_id': str(post.id)})
+            for post in moderated
+        )
+    return len(moderated)
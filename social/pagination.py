@@ -0,0 +1,65 @@
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import NotFound
+from mat.pagination import KeysetPagination
+
+
+class PostCursorPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class CommentCursorPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class WishlistCursorPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class TrendingCursorPagination(KeysetPagination):
+    ordering = ('-trending_score', '-id')
+
+
+class SearchCursorPagination(KeysetPagination):
+    ordering = ('score', 'post_id')
+    page_size = 20
+
+    def paginate_search(self, backend, query, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        try:
+            hits = backend.search(query, limit=self.page_size + 1, after=position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        self.has_next = len(hits) > self.page_size
+        self.page = hits[:self.page_size]
+        return self.page
+
+
+class TimelineCursorPagination(KeysetPagination):
+    ordering = ('-created_at', '-post_id')
+
+    def paginate_sources(self, sources, request, view=None):
+        """
+        Merge several querysets ordered on (created_at, post_id) into one
+        page. Each source is still read as a bounded range.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        rows = {}
+        for queryset in sources:
+            if position is not None:
+                try:
+                    queryset = queryset.filter(self.keyset_filter(position))
+                except (ValidationError, TypeError, ValueError):
+                    raise NotFound(self.invalid_cursor_message)
+            for row in queryset.order_by(*self.ordering)[:self.page_size + 1]:
+                rows.setdefault(row.post_id, row)
+
+        results = sorted(rows.values(), key=lambda row: (row.created_at, row.post_id), reverse=True)
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
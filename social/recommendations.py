@@ -0,0 +1,118 @@
+from collections import defaultdict
+import numpy as np
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.utils import timezone
+from .models import Post, Comment, Wishlist, UserInterest, TARGET_CATEGORIES
+
+ENGAGEMENT_WEIGHTS = {'like': 1.0, 'comment': 2.0, 'wishlist': 3.0}
+CANDIDATE_LIMIT = getattr(settings, 'RECOMMENDATION_CANDIDATE_LIMIT', 5000)
+RECENCY_WEIGHT = 0.1
+RECENCY_HALF_LIFE_HOURS = 72
+
+TARGET_CODES = {value: code for code, (value, _) in enumerate(TARGET_CATEGORIES, start=1)}
+
+
+def interest_keys(post):
+    keys = [('target', post.target_category)]
+    if post.category_id:
+        keys.append(('category', str(post.category_id)))
+    if post.occasion_id:
+        keys.append(('occasion', str(post.occasion_id)))
+    return keys
+
+
+def record_engagement(user_id, post, kind, undo=False):
+    record_engagements(user_id, [(post, kind, undo)])
+
+
+def record_engagements(user_id, changes):
+    """
+    Fold (post, kind, undo) likes/comments/wishlists, or their removal, into
+    the user's interest profile with two statements however many there are,
+    so reads never aggregate engagement.
+    """
+    deltas = defaultdict(float)
+    for post, kind, undo in changes:
+        for key in interest_keys(post):
+            deltas[key] += ENGAGEMENT_WEIGHTS[kind] * (-1 if undo else 1)
+    deltas = {key: weight for key, weight in deltas.items() if weight}
+    if not deltas:
+        return
+
+    UserInterest.objects.bulk_create(
+        [UserInterest(user_id=user_id, dimension=dimension, value=value) for dimension, value in deltas],
+        ignore_conflicts=True,
+    )
+    match = Q()
+    for dimension, value in deltas:
+        match |= Q(dimension=dimension, value=value)
+    delta = Case(
+        *[When(dimension=dimension, value=value, then=Value(weight)) for (dimension, value), weight in deltas.items()],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    UserInterest.objects.filter(match, user_id=user_id).update(weight=F('weight') + delta)
+
+
+def engaged_post_ids(user):
+    liked = Post.likes.through.objects.filter(user_id=user.id).values_list('post_id', flat=True)
+    commented = Comment.objects.filter(user=user).values_list('post_id', flat=True)
+    wishlisted = Wishlist.objects.filter(user=user).values_list('post_id', flat=True)
+    return set(liked) | set(commented) | set(wishlisted)
+
+
+def weight_table(interests, dimension, size):
+    table = np.zeros(size + 1)
+    for key, weight in interests.get(dimension, {}).items():
+        if key < len(table):
+            table[key] = weight
+    return table
+
+
+def recommend_post_ids(user, limit):
+    """
+    Score the newest CANDIDATE_LIMIT approved posts against the user's stored
+    interest weights in one vectorised pass and return the top `limit` ids,
+    best first, excluding posts the user already engaged with.
+    """
+    interests = {}
+    total = 0.0
+    for dimension, value, weight in UserInterest.objects.filter(user=user, weight__gt=0).values_list('dimension', 'value', 'weight'):
+        key = TARGET_CODES.get(value, 0) if dimension == 'target' else int(value)
+        interests.setdefault(dimension, {})[key] = weight
+        total += weight
+    if not total:
+        return []
+
+    rows = list(
+        Post.objects.filter(approval=True)
+        .order_by('-created_at', '-id')
+        .values_list('id', 'category_id', 'occasion_id', 'target_category', 'created_at')[:CANDIDATE_LIMIT]
+    )
+    if not rows:
+        return []
+
+    ids, categories, occasions, targets, created = zip(*rows)
+    ids = np.array(ids)
+    categories = np.array([c or 0 for c in categories])
+    occasions = np.array([o or 0 for o in occasions])
+    targets = np.array([TARGET_CODES.get(t, 0) for t in targets])
+    age_hours = np.array([(timezone.now() - c).total_seconds() / 3600 for c in created])
+
+    interest = (
+        weight_table(interests, 'category', categories.max())[categories]
+        + weight_table(interests, 'occasion', occasions.max())[occasions]
+        + weight_table(interests, 'target', len(TARGET_CODES))[targets]
+    ) / total
+    scores = interest + RECENCY_WEIGHT * np.exp2(-age_hours / RECENCY_HALF_LIFE_HOURS)
+
+    excluded = np.isin(ids, list(engaged_post_ids(user))) | (interest <= 0)
+    scores[excluded] = -np.inf
+
+    k = min(limit, int(np.count_nonzero(~excluded)))
+    if k == 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return ids[top].tolist()
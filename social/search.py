@@ -0,0 +1,155 @@
+import re
+from collections import namedtuple
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+from .models import Post
+
+SearchHit = namedtuple('SearchHit', ['post_id', 'score', 'snippet'])
+
+INDEX_BATCH_SIZE = 500
+
+
+class SearchBackend:
+    """
+    Keeps a search index of approved posts in sync and answers ranked,
+    keyset-paginated queries. Hits are ordered by ascending (score, post_id).
+    """
+
+    def index_posts(self, post_ids):
+        raise NotImplementedError
+
+    def remove_posts(self, post_ids):
+        raise NotImplementedError
+
+    def search(self, query, limit, after=None):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """Unindexed `icontains` fallback for databases without FTS5; newest first."""
+
+    def index_posts(self, post_ids):
+        pass
+
+    def remove_posts(self, post_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, limit, after=None):
+        posts = Post.objects.filter(
+            Q(approval=True) & (
+                Q(content__icontains=query) |
+                Q(category__name__icontains=query) |
+                Q(occasion__name__icontains=query) |
+                Q(target_category__icontains=query)
+            )
+        )
+        if after is not None:
+            posts = posts.filter(id__lt=int(after[1]))
+        ids = posts.order_by('-id').values_list('id', flat=True)[:limit]
+        return [SearchHit(post_id, -post_id, None) for post_id in ids]
+
+
+class SQLiteFTSSearchBackend(SearchBackend):
+    """
+    SQLite FTS5 inverted index keyed by post id, ranked with bm25. Every
+    query term is matched as a prefix, so results update while typing.
+    """
+    table = 'social_post_search'
+    # bm25 column weights: content, category, occasion, target
+    weights = (1.0, 0.5, 0.5, 0.25)
+    highlight = ('<mark>', '</mark>')
+
+    def index_posts(self, post_ids):
+        post_ids = list(post_ids)
+        for start in range(0, len(post_ids), INDEX_BATCH_SIZE):
+            batch = post_ids[start:start + INDEX_BATCH_SIZE]
+            rows = Post.objects.filter(id__in=batch, approval=True).values_list(
+                'id', 'content', 'category__name', 'occasion__name', 'target_category'
+            )
+            with connection.cursor() as cursor:
+                self._delete(cursor, batch)
+                cursor.executemany(
+                    f"INSERT INTO {self.table} (rowid, content, category, occasion, target) VALUES (%s, %s, %s, %s, %s)",
+                    [(post_id, content, category or '', occasion or '', target or '')
+                     for post_id, content, category, occasion, target in rows],
+                )
+
+    def remove_posts(self, post_ids):
+        post_ids = list(post_ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(post_ids), INDEX_BATCH_SIZE):
+                self._delete(cursor, post_ids[start:start + INDEX_BATCH_SIZE])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+        ids = Post.objects.filter(approval=True).order_by('id').values_list('id', flat=True)
+        self.index_posts(ids.iterator(chunk_size=INDEX_BATCH_SIZE))
+
+    def search(self, query, limit, after=None):
+        match = self.match_expression(query)
+        if not match:
+            return []
+
+        sql = (
+            f"SELECT rowid, score FROM ("
+            f"  SELECT rowid, bm25({self.table}, %s, %s, %s, %s) AS score"
+            f"  FROM {self.table} WHERE {self.table} MATCH %s"
+            f") "
+        )
+        params = [*self.weights, match]
+        if after is not None:
+            sql += "WHERE score > %s OR (score = %s AND rowid > %s) "
+            params += [float(after[0]), float(after[0]), int(after[1])]
+        sql += "ORDER BY score, rowid LIMIT %s"
+        params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            ranked = cursor.fetchall()
+            snippets = self._snippets(cursor, match, [post_id for post_id, _ in ranked])
+        return [SearchHit(post_id, score, snippets.get(post_id)) for post_id, score in ranked]
+
+    def match_expression(self, query):
+        terms = re.findall(r'\w+', query.lower())
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def _snippets(self, cursor, match, post_ids):
+        if not post_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(post_ids))
+        cursor.execute(
+            f"SELECT rowid, snippet({self.table}, 0, %s, %s, '…', 16) FROM {self.table} "
+            f"WHERE {self.table} MATCH %s AND rowid IN ({placeholders})",
+            [*self.highlight, match, *post_ids],
+        )
+        return dict(cursor.fetchall())
+
+    def _delete(self, cursor, post_ids):
+        if post_ids:
+            placeholders = ', '.join(['%s'] * len(post_ids))
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", post_ids)
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'SOCIAL_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'sqlite':
+            _backend = SQLiteFTSSearchBackend()
+        else:
+            _backend = DatabaseSearchBackend()
+    return _backend
@@ -1,22 +1,47 @@
 from rest_framework import serializers
 from . models import Post, PostImage, Comment, Wishlist
 from authentication.models import Profile
-from authentication.serializers import UserSerializer, ProfileSerializer
+from authentication.cards import get_user_cards
+from authentication.serializers import UserAvatarField, UserCardField
+from .images import variant_urls
+from .hydration import COMMENT_EXPAND_SIZE
 
 
 class PostImageSerializer(serializers.ModelSerializer):
+    variants = serializers.SerializerMethodField()
+
     class Meta:
         model = PostImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'width', 'height', 'placeholder', 'variants']
+
+    def get_variants(self, obj):
+        return variant_urls(obj)
+
 
+class SparseFieldsMixin:
+    """
+    `fields` limits the output to a subset of the declared fields and
+    `expand` opts into the heavy ones listed in Meta.expandable_fields.
+    """
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = set(expand or ())
+        for name in getattr(self.Meta, 'expandable_fields', ()):
+            if name not in expand:
+                self.fields.pop(name, None)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
-class PostSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    likes = UserSerializer(many=True, read_only=True)  # Full user info instead of IDs
+
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    user = UserCardField(source='user_id')
+    likes = serializers.SerializerMethodField()        # Full user info instead of IDs
     comments = serializers.SerializerMethodField()     # Custom nested data
-    likes_count = serializers.IntegerField(source='likes.count', read_only=True)
-    comments_count = serializers.IntegerField(source='comments.count', read_only=True)
-    profile = serializers.ImageField(source = 'user.profile.image', read_only=True)
+    likes_count = serializers.IntegerField(source='like_count', read_only=True)
+    comments_count = serializers.IntegerField(source='comment_count', read_only=True)
+    wishlist_count = serializers.IntegerField(read_only=True)
+    profile = UserAvatarField(source='user_id')
     images = PostImageSerializer(many=True, read_only=True)
 
     class Meta:
@@ -24,18 +49,83 @@ class PostSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'user', 'content', 'category', 'occasion', 'amazon_link',
             'target_category', 'likes', 'comments', 'likes_count',
-            'comments_count', 'views', 'created_at', 'profile', 'images'
+            'comments_count', 'wishlist_count', 'views', 'created_at', 'profile', 'images'
         ]
+        expandable_fields = ['likes', 'comments']
+
+    def get_likes(self, obj):
+        # Liker ids are batch-loaded by hydrate_posts, their cards by the view
+        liker_ids = getattr(obj, 'liker_ids', None)
+        if liker_ids is None:
+            liker_ids = list(obj.likes.order_by('id').values_list('id', flat=True))
+        cards = self.context.get('user_cards', {})
+        missing = set(liker_ids) - set(cards)
+        if missing:
+            cards = {**cards, **get_user_cards(missing)}
+        return [cards[user_id] for user_id in liker_ids if user_id in cards]
 
     def get_comments(self, obj):
-        # Get related comments and serialize them
-        comments = obj.comment.all().order_by('-created_at')
-        return CommentSerializer(comments, many=True).data
+        # Use the batch-loaded comments from hydrate_posts when available;
+        # the full thread is only served paginated by the comments endpoint
+        comments = getattr(obj, 'prefetched_comments', None)
+        if comments is None:
+            comments = obj.comment.order_by('-created_at', '-id')[:COMMENT_EXPAND_SIZE]
+        return CommentSerializer(comments, many=True, context=self.context).data
+
 
+class PostCardSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Lightweight representation used by every post list: the author, the
+    first image, the stored counters and a short comment preview.
+    """
+    user = UserCardField(source='user_id')
+    profile = UserAvatarField(source='user_id')
+    cover_image = serializers.SerializerMethodField()
+    cover = serializers.SerializerMethodField()
+    image_count = serializers.SerializerMethodField()
+    likes_count = serializers.IntegerField(source='like_count', read_only=True)
+    comments_count = serializers.IntegerField(source='comment_count', read_only=True)
+    wishlist_count = serializers.IntegerField(read_only=True)
+    comments = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Post
+        fields = [
+            'id', 'user', 'profile', 'content', 'category', 'occasion', 'amazon_link',
+            'target_category', 'cover_image', 'cover', 'image_count', 'likes_count',
+            'comments_count', 'wishlist_count', 'views', 'created_at', 'comments'
+        ]
+
+    def get_cover_image(self, obj):
+        # The card-sized JPEG once processed, the original until then
+        images = obj.images.all()
+        if not images:
+            return None
+        variants = variant_urls(images[0])
+        return variants['card']['jpeg'] if variants else images[0].image.url
+
+    def get_cover(self, obj):
+        images = obj.images.all()
+        if not images:
+            return None
+        cover = images[0]
+        return {
+            'width': cover.width,
+            'height': cover.height,
+            'placeholder': cover.placeholder,
+            'variants': variant_urls(cover),
+        }
+
+    def get_image_count(self, obj):
+        return len(obj.images.all())
+
+    def get_comments(self, obj):
+        # Filled in by hydrate_cards; never fall back to loading the thread
+        return CommentSerializer(getattr(obj, 'preview_comments', []), many=True, context=self.context).data
 
 
 class CommentSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    user = UserCardField(source='user_id')
 
     class Meta:
         model = Comment
@@ -43,9 +133,30 @@ class CommentSerializer(serializers.ModelSerializer):
 
 
 class WishlistSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    post = PostSerializer(read_only=True)
+    """
+    A saved post as a compact card; the owner is always the requester, so it
+    is left out. Cards are assembled by the view and passed in as
+    context['cards'], keyed by post id.
+    """
+    post = serializers.SerializerMethodField()
 
     class Meta:
         model = Wishlist
-        fields = ['id', 'user', 'post', 'created_at']
\ No newline at end of file
+        fields = ['id', 'post', 'created_at']
+
+    def get_post(self, obj):
+        return self.context['cards'][obj.post_id]
+
+
+class EngagementOperationSerializer(serializers.Serializer):
+    TYPES = ['like', 'unlike', 'wishlist', 'unwishlist', 'comment']
+
+    client_id = serializers.CharField(max_length=64)
+    type = serializers.ChoiceField(choices=TYPES)
+    post = serializers.IntegerField()
+    content = serializers.CharField(max_length=500, required=False)
+
+    def validate(self, attrs):
+        if attrs['type'] == 'comment' and not attrs.get('content'):
+            raise serializers.ValidationError({'content': 'This field is required for comments.'})
+        return attrs
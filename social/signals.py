@@ -0,0 +1,122 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from authentication.follows import follow_changed
+from authentication.models import Profile
+from .models import Post, PostImage, Comment, Wishlist, Category, Occasion
+from .caching import bump_content_version
+from .search import get_search_backend
+from .facets import invalidate_facets
+from .fragments import touch_posts
+from . import timeline
+
+
+@receiver(post_save, sender=Post)
+def handle_post_approval(sender, instance, created, **kwargs):
+    was_approved = getattr(instance, '_loaded_approval', False)
+    instance._loaded_approval = instance.approval
+
+    if instance.approval and not was_approved:
+        transaction.on_commit(lambda: timeline.fan_out_post(instance))
+    elif was_approved and not instance.approval:
+        timeline.retract_post(instance)
+
+    if instance.approval:
+        get_search_backend().index_posts([instance.id])
+    elif was_approved:
+        get_search_backend().remove_posts([instance.id])
+
+    if instance.approval or was_approved:
+        invalidate_facets()
+
+
+@receiver(post_delete, sender=Post)
+def handle_post_delete(sender, instance, **kwargs):
+    get_search_backend().remove_posts([instance.id])
+    if instance.approval:
+        invalidate_facets()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Occasion)
+def reindex_tagged_posts(sender, instance, created, **kwargs):
+    invalidate_facets()
+    if not created:
+        post_ids = instance.posts.filter(approval=True).values_list('id', flat=True)
+        get_search_backend().index_posts(post_ids.iterator())
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Occasion)
+def handle_tag_delete(sender, instance, **kwargs):
+    invalidate_facets()
+
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=PostImage)
+@receiver(post_delete, sender=PostImage)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Wishlist)
+@receiver(post_delete, sender=Wishlist)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Occasion)
+@receiver(post_save, sender=Profile)
+@receiver(m2m_changed, sender=Post.likes.through)
+@receiver(m2m_changed, sender=Profile.following.through)
+@receiver(follow_changed)
+def invalidate_cached_responses(sender, **kwargs):
+    # Bump after commit so no request can cache pre-commit data under the new version
+    if kwargs.get('action', 'post_').startswith('post_'):
+        transaction.on_commit(bump_content_version)
+
+
+@receiver(follow_changed)
+def sync_followed_timeline(sender, follower, target, following, **kwargs):
+    # Runs inside set_following's transaction, so the timeline moves with the row
+    sync_timeline_follows([(follower.id, target.id)], following)
+
+
+@receiver(m2m_changed, sender=Profile.following.through)
+def sync_changed_follows(sender, instance, action, reverse, pk_set, **kwargs):
+    # following.add()/remove()/clear() bypass set_following
+    if action == 'pre_clear':
+        partners = Profile.following.through.objects.filter(**{'to_profile_id' if reverse else 'from_profile_id': instance.pk})
+        instance._cleared_timeline_follows = set(partners.values_list('from_profile_id' if reverse else 'to_profile_id', flat=True))
+        return
+    if action in ('post_add', 'post_remove'):
+        partners = pk_set or ()
+    elif action == 'post_clear':
+        partners = getattr(instance, '_cleared_timeline_follows', ())
+    else:
+        return
+    pairs = [(partner, instance.pk) if reverse else (instance.pk, partner) for partner in partners]
+    if pairs:
+        sync_timeline_follows(pairs, action == 'post_add')
+
+
+def sync_timeline_follows(pairs, following):
+    if following:
+        timeline.add_followed_posts(pairs)
+    else:
+        timeline.remove_followed_posts(pairs)
+
+
+@receiver(post_save, sender=PostImage)
+@receiver(post_delete, sender=PostImage)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_post_fragment(sender, instance, **kwargs):
+    touch_posts(id=instance.post_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_responses(sender, instance, update_fields=None, **kwargs):
+    # Nested users come from the user-card cache, so fragments are left alone;
+    # only cached responses go. Logins only touch last_login, which none show.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(bump_content_version)
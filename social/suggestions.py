@@ -0,0 +1,153 @@
+from itertools import chain
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+from authentication.follows import Follow, followed_user_ids
+from authentication.models import Profile
+from .models import Post, Comment, Wishlist, FollowSuggestion
+from .recommendations import ENGAGEMENT_WEIGHTS
+
+TOP_K = getattr(settings, 'FOLLOW_SUGGESTION_TOP_K', 50)
+# Upper bound on the non-zeros of one batch's score matrix, which is what
+# bounds memory: rows are batched so their estimated product size fits
+BATCH_NNZ = getattr(settings, 'FOLLOW_SUGGESTION_BATCH_NNZ', 5_000_000)
+BATCH_ROWS = 10_000
+# Posts engaged by more users than this say little about shared taste and
+# would make co-engagement quadratic, so they are left out
+MAX_POST_ENGAGERS = getattr(settings, 'FOLLOW_SUGGESTION_MAX_POST_ENGAGERS', 1000)
+MUTUAL_FOLLOW_WEIGHT = 1.0
+CO_ENGAGEMENT_WEIGHT = 0.25
+CHUNK_SIZE = 10_000
+
+
+def load_pairs(queryset, *columns):
+    """Stream two integer columns into an (n, 2) array without building Python tuples for every row."""
+    rows = queryset.order_by().values_list(*columns).iterator(chunk_size=CHUNK_SIZE)
+    return np.fromiter(chain.from_iterable(rows), dtype=np.int64).reshape(-1, 2)
+
+
+def index_of(sorted_ids, values):
+    """Positions of `values` in `sorted_ids`, and which of them are there at all."""
+    positions = np.searchsorted(sorted_ids, values)
+    found = positions < len(sorted_ids)
+    found[found] = sorted_ids[positions[found]] == values[found]
+    return positions, found
+
+
+class SuggestionGraph:
+    """
+    The follow graph and user-by-post engagement as CSR matrices over the
+    users with a profile. Rows and columns are indexes into `user_ids`.
+    """
+
+    def __init__(self):
+        profiles = load_pairs(Profile.objects.all(), 'user_id', 'id')
+        profiles = profiles[np.argsort(profiles[:, 0])]
+        self.user_ids = profiles[:, 0]
+        n = len(self.user_ids)
+
+        # Follow rows reference profiles; index them by their user
+        by_profile = np.argsort(profiles[:, 1])
+        edges = load_pairs(Follow.objects.all(), 'from_profile_id', 'to_profile_id')
+        edges = by_profile[np.searchsorted(profiles[by_profile, 1], edges)]
+        self.follows = sparse.csr_matrix(
+            (np.ones(len(edges), dtype=np.float32), (edges[:, 0], edges[:, 1])), shape=(n, n),
+        )
+        self.follows.sum_duplicates()
+        self.follows.data[:] = 1
+
+        sources = [
+            (Post.likes.through.objects.all(), ENGAGEMENT_WEIGHTS['like']),
+            (Comment.objects.all(), ENGAGEMENT_WEIGHTS['comment']),
+            (Wishlist.objects.all(), ENGAGEMENT_WEIGHTS['wishlist']),
+        ]
+        pairs, weights = [], []
+        for queryset, weight in sources:
+            rows = load_pairs(queryset, 'user_id', 'post_id')
+            pairs.append(rows)
+            weights.append(np.full(len(rows), weight, dtype=np.float32))
+        pairs, weights = np.concatenate(pairs), np.concatenate(weights)
+
+        # Engagement by users without a profile cannot be followed back
+        users, known = index_of(self.user_ids, pairs[:, 0])
+        post_ids, posts = np.unique(pairs[known, 1], return_inverse=True)
+        engagement = sparse.csr_matrix((weights[known], (users[known], posts)), shape=(n, len(post_ids)))
+        engagement.sum_duplicates()
+
+        # Damp popular posts, drop the ones nobody shares or everybody does
+        engagers = np.diff(engagement.tocsc().indptr)
+        scale = np.where((engagers >= 2) & (engagers <= MAX_POST_ENGAGERS), 1 / np.log2(1 + np.maximum(engagers, 1)), 0)
+        self.engagement = (engagement @ sparse.diags(scale.astype(np.float32))).tocsr()
+        self.engagement.eliminate_zeros()
+        self.engagement_t = self.engagement.T.tocsr()
+
+    def batches(self, max_nnz=BATCH_NNZ, max_rows=BATCH_ROWS):
+        """
+        Split the rows into ranges whose estimated product size stays
+        within `max_nnz`: per row, the followees' out-degrees plus the
+        engager counts of its posts.
+        """
+        n = len(self.user_ids)
+        out_degree = np.diff(self.follows.indptr)
+        post_engagers = np.diff(self.engagement_t.indptr)
+        cost = self.follows @ out_degree + (self.engagement > 0) @ post_engagers + 1
+        cuts = np.flatnonzero(np.diff(np.cumsum(cost) // max_nnz)) + 1
+        cuts = np.union1d(cuts, np.arange(max_rows, n, max_rows))
+        return list(zip(np.r_[0, cuts], np.r_[cuts, n]))
+
+    def scores(self, start, stop):
+        """
+        Score matrix of rows [start, stop): mutual follows (followees who
+        follow them) plus shared engagement, without the user themselves
+        or anyone they already follow.
+        """
+        follows = self.follows[start:stop]
+        scores = (
+            MUTUAL_FOLLOW_WEIGHT * (follows @ self.follows)
+            + CO_ENGAGEMENT_WEIGHT * (self.engagement[start:stop] @ self.engagement_t)
+        ).tocsr()
+        own = sparse.csr_matrix(
+            (np.ones(stop - start, dtype=np.float32), (np.arange(stop - start), np.arange(start, stop))),
+            shape=scores.shape,
+        )
+        scores = scores - scores.multiply((follows + own) > 0)
+        scores.eliminate_zeros()
+        return scores
+
+
+def top_k_per_row(matrix, k):
+    """
+    The `k` largest entries of every row of a CSR matrix, as (row, column,
+    value) arrays sorted by row and then by value, best first.
+    """
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    order = np.lexsort((-matrix.data, rows))
+    rank = np.arange(len(order)) - matrix.indptr[rows[order]]
+    keep = order[rank < k]
+    return rows[keep], matrix.indices[keep], matrix.data[keep]
+
+
+def build_suggestions(graph, top_k=TOP_K, max_nnz=BATCH_NNZ):
+    """Yield the unsaved FollowSuggestion rows of one batch of users at a time."""
+    for start, stop in graph.batches(max_nnz):
+        rows, columns, values = top_k_per_row(graph.scores(start, stop), top_k)
+        bounds = np.cumsum(np.bincount(rows, minlength=stop - start))[:-1]
+        suggested = zip(np.split(graph.user_ids[columns], bounds), np.split(values.astype(float), bounds))
+        yield [
+            FollowSuggestion(
+                user_id=int(graph.user_ids[start + offset]),
+                suggested_ids=ids.tolist(),
+                scores=np.round(scores, 4).tolist(),
+            )
+            for offset, (ids, scores) in enumerate(suggested)
+            if len(ids)
+        ]
+
+
+def suggested_user_ids(user, limit):
+    """The stored suggestions for `user`, minus anyone followed since they were computed."""
+    suggestion = FollowSuggestion.objects.filter(user_id=user.id).first()
+    if suggestion is None:
+        return []
+    followed = followed_user_ids(user, suggestion.suggested_ids)
+    return [user_id for user_id in suggestion.suggested_ids if user_id not in followed][:limit]
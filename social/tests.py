@@ -1,3 +1,1130 @@
+import hashlib
+import json
+import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import skipUnless
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import TestCase
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image as PILImage
+from rest_framework.test import APIClient
+from rest_framework import status
+from unittest import mock
+from authentication.models import Profile
+from notification.models import Notification
+from .models import Post, PostImage, Comment, Category, Occasion, Wishlist, UserInterest, TimelineEntry, FollowSuggestion
+from . import fragments, images, suggestions, timeline
+from .facets import FACETS_CACHE_KEY, facet_cube
+from .impressions import ViewBuffer, view_buffer
 
-# Create your tests here.
+
+def setUpModule():
+    # The flush thread has its own connection and would write outside the test transactions
+    view_buffer.stop()
+
+
+def tearDownModule():
+    # Buffered views would otherwise be flushed at exit, after the test database is gone
+    view_buffer.reset()
+
+
+class PostFeedPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='feed@example.com', email='feed@example.com', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.posts = [
+            Post.objects.create(user=self.user, content=f'Post {i}', target_category='Men', approval=True)
+            for i in range(5)
+        ]
+
+    def test_cursor_walks_feed_without_gaps_or_duplicates(self):
+        seen = []
+        url = '/social/posts/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(post['id'] for post in response.data['results'])
+            url = response.data['next']
+
+        expected = [post.id for post in sorted(self.posts, key=lambda p: (p.created_at, p.id), reverse=True)]
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/social/posts/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PostFeedQueryBudgetTests(TestCase):
+    def setUp(self):
+        view_buffer.reset()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='budget@example.com', email='budget@example.com', password='password123')
+        self.client.force_authenticate(user=self.user)
+        fans = [User.objects.create_user(username=f'fan{i}@example.com') for i in range(3)]
+        for i in range(10):
+            post = Post.objects.create(user=self.user, content=f'Post {i}', target_category='Women', approval=True)
+            post.likes.add(*fans)
+            PostImage.objects.create(post=post, image=f'post_images/{i}.jpg')
+            for fan in fans:
+                Comment.objects.create(post=post, user=fan, content='Nice')
+        call_command('recount_post_engagement', stdout=StringIO())
+
+    def count_queries(self, url):
+        # Measure the cold path; cached card fragments are covered by FragmentCacheTests
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        small, _ = self.count_queries('/social/posts/?page_size=2')
+        large, response = self.count_queries('/social/posts/?page_size=10')
+
+        self.assertEqual(small, large)
+        # Page, images, comment previews and the uncached user cards, plus one
+        # query per viewer flag
+        self.assertLessEqual(large, 7)
+        post = response.data['results'][0]
+        self.assertEqual(post['likes_count'], 3)
+        self.assertEqual(post['comments_count'], 3)
+        self.assertEqual(len(post['comments']), 3)
+        self.assertEqual(post['cover_image'], '/media/post_images/9.jpg')
+
+    def test_feed_cards_support_sparse_fieldsets(self):
+        response = self.client.get('/social/posts/?fields=id,likes_count')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'likes_count'})
+
+    def test_viewer_flags_are_batched_per_page(self):
+        fan = User.objects.get(username='fan0@example.com')
+        self.client.force_authenticate(user=fan)
+        liked_only, response = self.count_queries('/social/posts/?fields=id,is_liked&page_size=10')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'is_liked'})
+        self.assertTrue(all(post['is_liked'] for post in response.data['results']))
+
+        newest = Post.objects.order_by('-id').first()
+        Wishlist.objects.create(user=fan, post=newest)
+        Profile.objects.create(user=fan, gender='Male').following.add(Profile.objects.create(user=self.user, gender='Male'))
+        all_flags, response = self.count_queries('/social/posts/?fields=id,is_liked,is_wishlisted,is_following_author')
+        self.assertEqual(all_flags, liked_only + 2)
+        flags = {post['id']: post for post in response.data['results']}
+        self.assertTrue(flags[newest.id]['is_wishlisted'])
+        self.assertEqual(sum(post['is_wishlisted'] for post in flags.values()), 1)
+        self.assertTrue(all(post['is_following_author'] for post in flags.values()))
+
+    def test_comment_previews_do_not_grow_with_thread_length(self):
+        before, _ = self.count_queries('/social/posts/?page_size=10')
+        post = Post.objects.order_by('-id').first()
+        Comment.objects.bulk_create([Comment(post=post, user=self.user, content=f'More {i}') for i in range(50)])
+        after, response = self.count_queries('/social/posts/?page_size=10')
+        self.assertEqual(before, after)
+        self.assertEqual([c['content'] for c in response.data['results'][0]['comments']], ['More 49', 'More 48', 'More 47'])
+
+    def test_comment_threads_are_cursor_paginated(self):
+        post = Post.objects.order_by('id').first()
+        seen = []
+        url = f'/social/posts/{post.id}/comments/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.extend(comment['id'] for comment in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, list(post.comment.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+    def test_detail_view_expands_heavy_fields_on_request(self):
+        post = Post.objects.order_by('id').first()
+        response = self.client.get(f'/social/posts/{post.id}/')
+        self.assertNotIn('likes', response.data)
+        self.assertNotIn('comments', response.data)
+
+        response = self.client.get(f'/social/posts/{post.id}/?expand=likes,comments')
+        self.assertEqual(len(response.data['likes']), 3)
+        self.assertEqual(len(response.data['comments']), 3)
+
+
+class EngagementCounterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(username='author@example.com', email='author@example.com')
+        self.user = User.objects.create_user(username='fan@example.com', email='fan@example.com')
+        self.client.force_authenticate(user=self.user)
+        self.post = Post.objects.create(user=self.author, content='Counted', target_category='Kids', approval=True)
+
+    def test_write_paths_keep_counters_in_sync(self):
+        self.client.post(f'/social/posts/{self.post.id}/likes/')
+        self.client.post(f'/social/post/{self.post.id}/wishlist/')
+        self.client.post(f'/social/posts/{self.post.id}/comments/', {'post': self.post.id, 'content': 'Love it'})
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count, self.post.wishlist_count), (1, 1, 1))
+
+        self.client.post(f'/social/posts/{self.post.id}/likes/')
+        self.client.post(f'/social/post/{self.post.id}/wishlist/')
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.wishlist_count), (0, 0))
+
+    def test_explicit_state_makes_toggles_idempotent(self):
+        url = f'/social/posts/{self.post.id}/likes/'
+        for _ in range(2):
+            response = self.client.post(url, {'liked': True})
+            self.assertEqual((response.data['liked'], response.data['likes']), (True, 1))
+        response = self.client.post(url, {'liked': False})
+        self.assertEqual((response.data['liked'], response.data['likes']), (False, 0))
+        response = self.client.post(url)
+        self.assertEqual((response.data['liked'], response.data['likes']), (True, 1))
+
+        url = f'/social/post/{self.post.id}/wishlist/'
+        self.assertEqual(self.client.post(url, {'wishlisted': True}).status_code, status.HTTP_201_CREATED)
+        response = self.client.post(url, {'wishlisted': True})
+        self.assertEqual((response.status_code, response.data['wishlist_count']), (status.HTTP_200_OK, 1))
+        self.assertEqual(Wishlist.objects.filter(post=self.post).count(), 1)
+        self.assertEqual(UserInterest.objects.get(user=self.user, dimension='target').weight, 4)
+
+    @mock.patch('notification.dispatch.DISPATCH_SYNC', True)
+    def test_notifications_are_sent_after_commit(self):
+        with mock.patch('notification.dispatch.send_push_notification') as send:
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.client.post(f'/social/posts/{self.post.id}/likes/')
+            send.assert_not_called()
+            for callback in callbacks:
+                callback()
+        self.assertEqual(send.call_args.kwargs['user'], self.author)
+        self.assertEqual(send.call_args.kwargs['title'], 'New Like')
+
+    @mock.patch('notification.dispatch.DISPATCH_SYNC', True)
+    def test_notification_failures_do_not_fail_the_request(self):
+        with mock.patch('notification.dispatch.send_push_notification', side_effect=RuntimeError('FCM down')):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(f'/social/post/{self.post.id}/wishlist/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['wishlist_count'], 1)
+
+    def test_recount_command_repairs_drift(self):
+        self.post.likes.add(self.user)
+        Post.objects.filter(id=self.post.id).update(comment_count=7)
+        call_command('recount_post_engagement', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 0))
+
+
+class HomeTimelineTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.reader = User.objects.create_user(username='reader@example.com', email='reader@example.com')
+        self.author = User.objects.create_user(username='writer@example.com', email='writer@example.com')
+        self.stranger = User.objects.create_user(username='stranger@example.com', email='stranger@example.com')
+        profiles = {user: Profile.objects.create(user=user, gender='Female') for user in (self.reader, self.author, self.stranger)}
+        profiles[self.reader].following.add(profiles[self.author])
+        self.author_profile = profiles[self.author]
+        self.client.force_authenticate(user=self.reader)
+
+    def publish(self, user, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(user=user, content=content, target_category='Women')
+            post.approval = True
+            post.save()
+        return post
+
+    def timeline_ids(self):
+        return [post['id'] for post in self.client.get('/social/timeline/').data['results']]
+
+    def test_unfollowing_removes_the_authors_posts(self):
+        followed = self.publish(self.author, 'Followed')
+        self.assertEqual(self.timeline_ids(), [followed.id])
+
+        self.client.delete(f'/auth/users/{self.author.id}/follow/')
+        self.assertEqual(self.timeline_ids(), [])
+
+        self.client.post(f'/auth/users/{self.author.id}/follow/')
+        self.assertEqual(self.timeline_ids(), [followed.id])
+
+        self.author_profile.followers.clear()
+        self.assertEqual(self.timeline_ids(), [])
+
+    def test_following_backfills_recent_approved_posts(self):
+        Post.objects.create(user=self.stranger, content='Pending', target_category='Women')
+        older = self.publish(self.stranger, 'Older')
+        newer = self.publish(self.stranger, 'Newer')
+        self.assertEqual(self.timeline_ids(), [])
+
+        self.reader.profile.following.add(self.stranger.profile)
+        self.assertEqual(self.timeline_ids(), [newer.id, older.id])
+        self.reader.profile.following.remove(self.stranger.profile)
+        self.assertEqual(self.timeline_ids(), [])
+
+    def test_approved_posts_are_fanned_out_to_followers(self):
+        Post.objects.create(user=self.author, content='Pending', target_category='Women')
+        followed = self.publish(self.author, 'Followed')
+        self.publish(self.stranger, 'Not followed')
+
+        response = self.client.get('/social/timeline/')
+        self.assertEqual([post['id'] for post in response.data['results']], [followed.id])
+
+        followed.approval = False
+        followed.save()
+        response = self.client.get('/social/timeline/')
+        self.assertEqual(response.data['results'], [])
+
+    def test_high_follower_authors_are_merged_on_read(self):
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWER_LIMIT', 0):
+            posts = [self.publish(self.author, f'Celebrity {i}') for i in range(3)]
+
+        self.author_profile.refresh_from_db()
+        self.assertTrue(self.author_profile.fanout_on_read)
+
+        seen = []
+        url = '/social/timeline/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.extend(post['id'] for post in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [post.id for post in reversed(posts)])
+
+
+class TrendingScoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='trend@example.com', email='trend@example.com')
+        self.client.force_authenticate(user=self.user)
+
+    def test_engagement_rescoring_orders_trending(self):
+        quiet = Post.objects.create(user=self.user, content='Quiet', target_category='Men', approval=True)
+        liked = Post.objects.create(user=self.user, content='Liked', target_category='Kids', approval=True)
+        Post.objects.filter(id=liked.id).update(created_at=quiet.created_at)
+
+        self.client.post(f'/social/posts/{liked.id}/likes/')
+        liked.refresh_from_db()
+        self.assertTrue(liked.trending_stale)
+
+        call_command('update_trending_scores', stdout=StringIO())
+        liked.refresh_from_db()
+        self.assertFalse(liked.trending_stale)
+
+        response = self.client.get('/social/posts/trending/')
+        self.assertEqual([post['id'] for post in response.data['results']], [liked.id, quiet.id])
+
+        response = self.client.get('/social/posts/trending/?target=Men')
+        self.assertEqual([post['id'] for post in response.data['results']], [quiet.id])
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='shopper@example.com', email='shopper@example.com')
+        self.author = User.objects.create_user(username='seller@example.com', email='seller@example.com')
+        self.client.force_authenticate(user=self.user)
+        self.shoes = Category.objects.create(name='Shoes')
+        self.hats = Category.objects.create(name='Hats')
+
+    def create_post(self, category, target):
+        return Post.objects.create(user=self.author, content='Item', category=category, target_category=target, approval=True)
+
+    def test_recommendations_are_ranked_and_exclude_engaged_posts(self):
+        liked = self.create_post(self.shoes, 'Women')
+        best = self.create_post(self.shoes, 'Women')
+        partial = self.create_post(self.hats, 'Women')
+        self.create_post(self.hats, 'Men')
+
+        self.client.post(f'/social/posts/{liked.id}/likes/')
+        self.assertEqual(UserInterest.objects.get(user=self.user, dimension='category').weight, 1.0)
+
+        response = self.client.get('/social/posts/recommended/')
+        self.assertEqual([post['id'] for post in response.data['results']], [best.id, partial.id])
+
+    def test_rebuild_command_matches_incremental_profile(self):
+        post = self.create_post(self.shoes, 'Kids')
+        self.client.post(f'/social/posts/{post.id}/likes/')
+        self.client.post(f'/social/post/{post.id}/wishlist/')
+        incremental = set(UserInterest.objects.values_list('dimension', 'value', 'weight'))
+
+        call_command('rebuild_user_interests', stdout=StringIO())
+        self.assertEqual(set(UserInterest.objects.values_list('dimension', 'value', 'weight')), incremental)
+
+
+class PostSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='search@example.com', email='search@example.com')
+        self.occasion_post = Post.objects.create(user=self.user, content='Linen shirt for the summer wedding', target_category='Men', approval=True)
+        self.shirt_post = Post.objects.create(user=self.user, content='Shirt shirt shirt, a plain shirt', target_category='Men', approval=True)
+        Post.objects.create(user=self.user, content='Pending shirt review', target_category='Men')
+
+    def search(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_prefix_queries_are_ranked_and_highlighted(self):
+        response = self.search('/social/posts/search/?query=shi')
+        results = response.data['results']
+        self.assertEqual([post['id'] for post in results], [self.shirt_post.id, self.occasion_post.id])
+        self.assertIn('<mark>shirt</mark>', results[1]['snippet'].lower())
+
+        response = self.search('/social/posts/search/?query=wedding%20shirt')
+        self.assertEqual([post['id'] for post in response.data['results']], [self.occasion_post.id])
+
+    def test_index_follows_edits_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shirt_post.content = 'Leather boots'
+            self.shirt_post.save()
+        self.assertEqual(len(self.search('/social/posts/search/?query=boots').data['results']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shirt_post.delete()
+        self.assertEqual(self.search('/social/posts/search/?query=boots').data['results'], [])
+
+    def test_search_results_are_paginated(self):
+        first = self.search('/social/posts/search/?query=shirt&page_size=1')
+        second = self.search(first.data['next'])
+        self.assertEqual(
+            [first.data['results'][0]['id'], second.data['results'][0]['id']],
+            [self.shirt_post.id, self.occasion_post.id],
+        )
+        self.assertIsNone(second.data['next'])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class QueryPlanTests(TestCase):
+    """
+    Every endpoint's main query must be answered from an index: no full
+    table scan and no temporary B-tree to sort. Search is left out because
+    bm25 ranking always sorts the matches.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='plan@example.com', email='plan@example.com')
+        self.author = User.objects.create_user(username='planner@example.com', email='planner@example.com')
+        Profile.objects.create(user=self.user, gender='Male')
+        Profile.objects.create(user=self.author, gender='Male')
+        self.client.force_authenticate(user=self.user)
+
+        self.category = Category.objects.create(name='Jackets')
+        self.occasion = Occasion.objects.create(name='Party')
+        self.posts = [
+            Post.objects.create(user=self.author, content=f'Jacket {i}', category=self.category,
+                                occasion=self.occasion, target_category='Men', approval=True)
+            for i in range(5)
+        ]
+        for post in self.posts:
+            Comment.objects.create(post=post, user=self.user, content='Nice')
+            Wishlist.objects.create(post=post, user=self.user)
+        Notification.objects.create(user=self.user, title='Hello')
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexedPlan(self, url, table):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        queries = [q['sql'] for q in context.captured_queries if re.match(rf'SELECT .*? FROM "{table}"', q['sql'])]
+        self.assertTrue(queries, f'{url} issued no query against {table}')
+        for sql in queries:
+            for step in self.explain(sql):
+                self.assertNotRegex(step, rf'^SCAN {table}$', f'{url} scans {table}: {sql}')
+                self.assertNotIn('USE TEMP B-TREE', step, f'{url} sorts in a temp B-tree: {sql}')
+        return response
+
+    def test_post_feeds(self):
+        response = self.assertIndexedPlan('/social/posts/?page_size=2', 'social_post')
+        self.assertIndexedPlan(response.data['next'], 'social_post')
+        self.assertIndexedPlan(f'/social/posts/filter/?category={self.category.id}', 'social_post')
+        self.assertIndexedPlan(f'/social/posts/filter/?occasion={self.occasion.id}', 'social_post')
+        self.assertIndexedPlan('/social/posts/filter/?target=Men', 'social_post')
+        self.assertIndexedPlan('/social/posts/', 'social_comment')
+        UserInterest.objects.create(user=self.user, dimension='target', value='Men', weight=1)
+        self.assertIndexedPlan('/social/posts/recommended/', 'social_userinterest')
+        self.assertIndexedPlan('/social/posts/recommended/', 'social_post')
+
+    def test_trending(self):
+        self.assertIndexedPlan('/social/posts/trending/', 'social_post')
+        self.assertIndexedPlan('/social/posts/trending/?target=Men', 'social_post')
+
+    def test_timeline_comments_and_wishlist(self):
+        self.assertIndexedPlan('/social/timeline/', 'social_timelineentry')
+        Comment.objects.create(post=self.posts[0], user=self.user, content='Again')
+        response = self.assertIndexedPlan(f'/social/posts/{self.posts[0].id}/comments/?page_size=1', 'social_comment')
+        self.assertIndexedPlan(response.data['next'], 'social_comment')
+        self.assertIndexedPlan('/social/post/wishlist/', 'social_wishlist')
+        self.assertIndexedPlan('/social/post/wishlist/ids/', 'social_wishlist')
+
+    def test_notifications(self):
+        self.assertIndexedPlan('/notification/', 'notification_notification')
+        self.assertIndexedPlan('/notification/unread-count/', 'notification_notification')
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        view_buffer.reset()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='facets@example.com', email='facets@example.com')
+        self.shoes = Category.objects.create(name='Shoes')
+        self.bags = Category.objects.create(name='Bags')
+        self.party = Occasion.objects.create(name='Party')
+        for category, target in [(self.shoes, 'Men'), (self.shoes, 'Women'), (self.bags, 'Women')]:
+            Post.objects.create(user=self.user, content='Item', category=category, occasion=self.party,
+                                target_category=target, approval=True)
+
+    def facets(self, query=''):
+        response = self.client.get(f'/social/posts/filter/?facets=true{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['facets']
+
+    def test_facets_reflect_the_other_active_filters(self):
+        facets = self.facets('&target=Women')
+        self.assertEqual(
+            [(f['name'], f['count']) for f in facets['category']],
+            [('Shoes', 1), ('Bags', 1)],
+        )
+        # The target facet ignores the target filter itself
+        self.assertEqual([(f['value'], f['count']) for f in facets['target']], [('Men', 1), ('Women', 2)])
+
+        facets = self.facets(f'&category={self.shoes.id}')
+        self.assertEqual([(f['name'], f['count']) for f in facets['occasion']], [('Party', 2)])
+
+    def test_facets_are_cached_and_invalidated_by_approval(self):
+        self.facets()
+        with self.assertNumQueries(0):
+            facet_cube()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(user=self.user, content='New', category=self.bags, target_category='Kids', approval=True)
+        facets = self.facets()
+        self.assertIn({'value': 'Kids', 'count': 1}, facets['target'])
+
+    def test_facets_are_invalidated_only_once_the_approval_commits(self):
+        facet_cube()
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(user=self.user, content='New', category=self.bags, target_category='Kids', approval=True)
+            # A request racing the transaction still finds the cube cached,
+            # so it cannot store one built from pre-commit rows
+            self.assertIsNotNone(cache.get(FACETS_CACHE_KEY))
+        self.assertIsNone(cache.get(FACETS_CACHE_KEY))
+        self.assertIn(('Kids', 1), [(f['value'], f['count']) for f in self.facets()['target']])
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        view_buffer.reset()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='cache@example.com', email='cache@example.com')
+        self.post = Post.objects.create(user=self.user, content='Cached', target_category='Men', approval=True)
+
+    def test_repeat_requests_are_served_from_cache(self):
+        first = self.client.get('/social/posts/filter/?target=Men&page_size=5')
+        with self.assertNumQueries(0):
+            second = self.client.get('/social/posts/filter/?page_size=5&target=Men')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_conditional_get_returns_304_until_content_changes(self):
+        etag = self.client.get('/social/posts/trending/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/social/posts/trending/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, user=self.user, content='New')
+        response = self.client.get('/social/posts/trending/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_following_through_the_api_changes_the_etag(self):
+        fan = User.objects.create_user(username='cache-follower@example.com')
+        Profile.objects.create(user=fan, gender='Male')
+        Profile.objects.create(user=self.user, gender='Male')
+        self.client.force_authenticate(user=fan)
+        response = self.client.get('/social/posts/trending/')
+        self.assertFalse(response.data['results'][0]['is_following_author'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/auth/users/{self.user.id}/follow/')
+        response = self.client.get('/social/posts/trending/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['results'][0]['is_following_author'])
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/auth/users/{self.user.id}/follow/')
+        response = self.client.get('/social/posts/trending/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['results'][0]['is_following_author'])
+
+    def test_liking_through_the_api_changes_the_etag(self):
+        fan = User.objects.create_user(username='cache-liker@example.com')
+        self.client.force_authenticate(user=fan)
+        response = self.client.get('/social/posts/trending/')
+        self.assertEqual(response.data['results'][0]['likes_count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/social/posts/{self.post.id}/likes/')
+        response = self.client.get('/social/posts/trending/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['likes_count'], 1)
+        self.assertTrue(response.data['results'][0]['is_liked'])
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/social/posts/{self.post.id}/likes/')
+        response = self.client.get('/social/posts/trending/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['likes_count'], 0)
+
+    def test_cached_pages_carry_each_viewers_flags(self):
+        fan = User.objects.create_user(username='cache-fan@example.com')
+        self.post.likes.add(fan)
+        anonymous = self.client.get('/social/posts/trending/')
+        self.client.force_authenticate(user=fan)
+        with self.assertNumQueries(3):
+            response = self.client.get('/social/posts/trending/')
+        self.assertFalse(anonymous.data['results'][0]['is_liked'])
+        self.assertTrue(response.data['results'][0]['is_liked'])
+        self.assertNotEqual(anonymous['ETag'], response['ETag'])
+
+
+class ViewCountingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        view_buffer.reset()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='viewer@example.com', email='viewer@example.com')
+        self.client.force_authenticate(user=self.user)
+        self.posts = [
+            Post.objects.create(user=self.user, content=f'Post {i}', target_category='Men', approval=True)
+            for i in range(3)
+        ]
+
+    def test_views_are_buffered_deduplicated_and_flushed_in_batches(self):
+        self.client.get('/social/posts/')
+        self.client.get('/social/posts/')
+        self.client.get(f'/social/posts/{self.posts[0].id}/')
+        self.assertEqual(view_buffer.depth(), {'posts': 3, 'views': 3})
+        self.assertEqual(Post.objects.get(id=self.posts[0].id).views, 0)
+
+        other = User.objects.create_user(username='other-viewer@example.com')
+        self.client.force_authenticate(user=other)
+        self.client.get(f'/social/posts/{self.posts[0].id}/')
+
+        with self.assertNumQueries(4):
+            self.assertEqual(view_buffer.flush(), 4)
+        self.assertEqual(
+            dict(Post.objects.filter(id__in=[p.id for p in self.posts]).values_list('id', 'views')),
+            {self.posts[0].id: 2, self.posts[1].id: 1, self.posts[2].id: 1},
+        )
+        self.assertEqual(view_buffer.depth(), {'posts': 0, 'views': 0})
+
+    def test_cached_responses_are_counted(self):
+        self.client.get('/social/posts/trending/')
+        cache.delete_many([f'social:viewed:u{self.user.id}:{post.id}' for post in self.posts])
+        # Only the viewer flags are read
+        with self.assertNumQueries(3):
+            self.client.get('/social/posts/trending/')
+        self.assertEqual(view_buffer.depth()['views'], 6)
+
+    def test_requests_never_flush(self):
+        with mock.patch('social.impressions.VIEW_FLUSH_THRESHOLD', 3), CaptureQueriesContext(connection) as context:
+            self.client.get('/social/posts/')
+        self.assertFalse([query for query in context if query['sql'].startswith('UPDATE')])
+        self.assertEqual(view_buffer.depth()['views'], 3)
+        self.assertEqual(Post.objects.filter(views=1).count(), 0)
+
+    def test_flush_thread_runs_on_its_interval_and_when_full(self):
+        buffer = ViewBuffer()
+        flushed = threading.Semaphore(0)
+        with mock.patch.object(buffer, 'flush', side_effect=lambda: flushed.release()):
+            with mock.patch('social.impressions.VIEW_FLUSH_INTERVAL', 0.01):
+                buffer.start()
+                self.assertTrue(flushed.acquire(timeout=5))
+                buffer.stop()
+            with mock.patch('social.impressions.VIEW_FLUSH_THRESHOLD', 2):
+                buffer.start()
+                buffer.add([self.posts[0].id, self.posts[1].id])
+                self.assertTrue(flushed.acquire(timeout=5))
+                buffer.stop()
+        self.assertIsNone(buffer._thread)
+
+    def test_buffer_depth_is_staff_only(self):
+        self.client.get('/social/posts/')
+        self.assertEqual(self.client.get('/social/posts/views/buffer/').status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/social/posts/views/buffer/')
+        self.assertEqual(response.data['posts'], 3)
+        self.assertEqual(response.data['views'], 3)
+
+
+@mock.patch('notification.dispatch.DISPATCH_SYNC', True)
+class EngagementSyncTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(username='sync-author@example.com')
+        self.user = User.objects.create_user(username='sync@example.com')
+        self.client.force_authenticate(user=self.user)
+        self.posts = [
+            Post.objects.create(user=self.author, content=f'Post {i}', target_category='Women', approval=True)
+            for i in range(3)
+        ]
+
+    def sync(self, operations):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/social/engagement/sync/', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']
+
+    def test_batch_is_applied_and_replays_are_idempotent(self):
+        first, second, third = self.posts
+        operations = [
+            {'client_id': 'a', 'type': 'like', 'post': first.id},
+            {'client_id': 'b', 'type': 'like', 'post': second.id},
+            {'client_id': 'c', 'type': 'unlike', 'post': second.id},
+            {'client_id': 'd', 'type': 'wishlist', 'post': third.id},
+            {'client_id': 'e', 'type': 'comment', 'post': first.id, 'content': 'Offline comment'},
+            {'client_id': 'f', 'type': 'like', 'post': 0},
+            {'client_id': 'g', 'type': 'comment', 'post': first.id},
+        ]
+        with mock.patch('notification.dispatch.send_push_notification') as send:
+            results = self.sync(operations)
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['applied', 'unchanged', 'unchanged', 'applied', 'applied', 'error', 'error'],
+        )
+        self.assertEqual(results[0]['liked'], True)
+        self.assertEqual(results[2]['liked'], False)
+        self.assertEqual(results[3]['wishlisted'], True)
+
+        send.assert_called_once()
+        self.assertEqual(send.call_args.kwargs['user'], self.author)
+        self.assertEqual(send.call_args.kwargs['body'], 'sync@example.com liked a post of yours, wishlisted a post of yours, commented on a post of yours.')
+
+        counters = dict(Post.objects.values_list('id', 'like_count'))
+        self.assertEqual(counters, {first.id: 1, second.id: 0, third.id: 0})
+        self.assertEqual(Post.objects.get(id=first.id).comment_count, 1)
+        self.assertEqual(Post.objects.get(id=third.id).wishlist_count, 1)
+        self.assertEqual(UserInterest.objects.get(user=self.user, dimension='target').weight, 6)
+
+        with mock.patch('notification.dispatch.send_push_notification') as send:
+            replay = self.sync(operations[:5])
+        send.assert_not_called()
+        self.assertEqual({result['status'] for result in replay}, {'unchanged'})
+        self.assertEqual(replay[4]['comment_id'], results[4]['comment_id'])
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(UserInterest.objects.get(user=self.user, dimension='target').weight, 6)
+
+    def test_batch_size_is_limited(self):
+        operations = [{'client_id': str(i), 'type': 'like', 'post': self.posts[0].id} for i in range(201)]
+        response = self.client.post('/social/engagement/sync/', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@mock.patch('social.images.PROCESSING_SYNC', True)
+class ImageProcessingTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.settings_override = self.settings(MEDIA_ROOT=media)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='images@example.com', email='images@example.com')
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, name='photo.png', size=(2000, 1000)):
+        buffer = BytesIO()
+        PILImage.new('RGB', size, (200, 40, 40)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_upload_returns_before_processing_then_serves_variants(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/social/posts/', {
+                'content': 'Red', 'target_category': 'Men', 'images': [self.upload()],
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        image = PostImage.objects.get(post_id=response.data['id'])
+        self.assertEqual(image.processing_status, 'pending')
+
+        for callback in callbacks:
+            callback()
+        image.refresh_from_db()
+        self.assertEqual((image.processing_status, image.width, image.height), ('ready', 2000, 1000))
+        self.assertTrue(image.placeholder)
+        self.assertEqual(
+            {name: (variant['width'], variant['height']) for name, variant in image.variants.items()},
+            {'thumb': (160, 80), 'card': (640, 320), 'full': (1600, 800)},
+        )
+
+        Post.objects.filter(id=image.post_id).update(approval=True)
+        card = self.client.get('/social/posts/').data['results'][0]
+        self.assertRegex(card['cover_image'], r'_card\.jpg$')
+        self.assertEqual(set(card['cover']['variants']), {'thumb', 'card', 'full'})
+        self.assertRegex(card['cover']['variants']['thumb']['webp'], r'_thumb\.webp$')
+        detail = self.client.get(f'/social/posts/{image.post_id}/').data
+        self.assertEqual(detail['images'][0]['placeholder'], image.placeholder)
+
+    def test_uploads_are_hashed_while_streaming(self):
+        upload = self.upload()
+        expected = hashlib.sha256(upload.read()).hexdigest()
+        upload.seek(0)
+        response = self.client.post('/social/posts/', {
+            'content': 'Hashed', 'target_category': 'Men', 'images': [upload],
+        }, format='multipart')
+        self.assertEqual(PostImage.objects.get(post_id=response.data['id']).checksum, expected)
+
+    def test_oversized_and_invalid_uploads_are_rejected_before_decoding(self):
+        cases = [
+            ('mat.uploads.MAX_IMAGE_PIXELS', 1_000_000, self.upload(size=(2000, 1000)), 'megapixels'),
+            ('mat.uploads.MAX_IMAGE_BYTES', 1024, self.upload(size=(2000, 1000)), 'larger than'),
+            ('mat.uploads.MAX_IMAGE_BYTES', 2 ** 20, SimpleUploadedFile('notes.png', b'not an image'), 'not a supported'),
+        ]
+        for setting, limit, upload, message in cases:
+            with mock.patch(setting, limit), mock.patch('PIL.Image.Image.load') as load:
+                response = self.client.post('/social/posts/', {
+                    'content': 'Too big', 'target_category': 'Men', 'images': [upload],
+                }, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(message, response.data['images'][0])
+            load.assert_not_called()
+        self.assertFalse(Post.objects.exists())
+
+    def create_post(self, count):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/social/posts/', {
+                'content': 'Batch', 'target_category': 'Men', 'images': [self.upload(size=(20, 20)) for _ in range(count)],
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return len(context.captured_queries), response
+
+    def test_post_creation_is_one_unit_of_work(self):
+        # The author's profile is cached on the authenticated user after one request
+        self.create_post(1)
+        single, _ = self.create_post(1)
+        several, response = self.create_post(4)
+        self.assertEqual(single, several)
+        self.assertEqual(len(response.data['images']), 4)
+        self.assertEqual(
+            [image['id'] for image in response.data['images']],
+            list(PostImage.objects.filter(post_id=response.data['id']).order_by('id').values_list('id', flat=True)),
+        )
+
+        with mock.patch.object(PostImage.objects, 'bulk_create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                self.create_post(2)
+        self.assertEqual(Post.objects.filter(content='Batch').count(), 3)
+
+    def test_import_command_loads_posts_in_chunks(self):
+        Category.objects.create(name='Shoes')
+        folder = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, folder, ignore_errors=True)
+        PILImage.new('RGB', (30, 20)).save(folder / 'a.png')
+        rows = [
+            {'user': self.user.username, 'content': 'Imported boots', 'target_category': 'Men', 'category': 'Shoes',
+             'approval': True, 'created_at': '2024-01-02T03:04:05+00:00', 'images': ['a.png', 'a.png']},
+            {'user': 'nobody', 'content': 'Orphan', 'target_category': 'Men'},
+            {'user': self.user.username, 'content': 'Pending', 'target_category': 'Kids', 'images': ['missing.png']},
+            {'user': self.user.username, 'content': 'Draft', 'target_category': 'Kids', 'occasion': 'Eid'},
+        ]
+        (folder / 'posts.jsonl').write_text('\n'.join(json.dumps(row) for row in rows) + '\n{broken\n')
+
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', str(folder / 'posts.jsonl'), '--chunk-size=2', '--create-tags', stdout=out, stderr=err)
+        self.assertIn('Imported 2 posts with 2 images, skipped 3', out.getvalue())
+        self.assertIn("unknown user 'nobody'", err.getvalue())
+
+        boots = Post.objects.get(content='Imported boots')
+        self.assertEqual(boots.created_at.year, 2024)
+        self.assertEqual(boots.category.name, 'Shoes')
+        self.assertEqual(boots.images.count(), 2)
+        self.assertEqual(Post.objects.get(content='Draft').occasion.name, 'Eid')
+        self.assertTrue(TimelineEntry.objects.filter(post=boots, user=self.user).exists())
+        response = self.client.get('/social/posts/search/?query=boots')
+        self.assertEqual([post['id'] for post in response.data['results']], [boots.id])
+
+    def test_crashed_worker_is_replaced_and_retried(self):
+        data = self.upload().read()
+        broken, working = mock.Mock(), mock.Mock()
+        broken.submit.return_value.result.side_effect = BrokenProcessPool()
+        working.submit.return_value.result.return_value = 'rendered'
+        with mock.patch('social.images.PROCESSING_SYNC', False), \
+                mock.patch('social.images.get_pool', side_effect=[broken, working]):
+            self.assertEqual(images.render(data), 'rendered')
+
+    def test_command_retries_interrupted_images(self):
+        post = Post.objects.create(user=self.user, content='Stuck', target_category='Men')
+        image = PostImage.objects.create(post=post, image=default_storage.save('post_images/stuck.png', self.upload()))
+        PostImage.objects.filter(id=image.id).update(
+            processing_attempts=1, processing_started_at=timezone.now() - timedelta(hours=1),
+        )
+        call_command('process_post_images', stdout=StringIO())
+        image.refresh_from_db()
+        self.assertEqual((image.processing_status, image.processing_attempts), ('ready', 2))
+
+
+class WishlistListingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(username='saved-author@example.com')
+        self.user = User.objects.create_user(username='saver@example.com')
+        self.client.force_authenticate(user=self.user)
+        for i in range(6):
+            post = Post.objects.create(user=self.author, content=f'Saved {i}', target_category='Women', approval=True)
+            PostImage.objects.create(post=post, image=f'post_images/saved{i}.jpg')
+            Comment.objects.create(post=post, user=self.author, content='Thanks')
+            Wishlist.objects.create(user=self.user, post=post)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def test_wishlist_is_paginated_with_compact_cards(self):
+        small, _ = self.count_queries('/social/post/wishlist/?page_size=2')
+        large, response = self.count_queries('/social/post/wishlist/?page_size=6')
+        self.assertEqual(small, large)
+
+        item = response.data['results'][0]
+        self.assertEqual(set(item), {'id', 'post', 'created_at'})
+        self.assertEqual(item['post']['content'], 'Saved 5')
+        self.assertTrue(item['post']['is_wishlisted'])
+        self.assertNotIn('likes', item['post'])
+
+        seen, url = [], '/social/post/wishlist/?page_size=4&fields=id'
+        while url:
+            response = self.client.get(url)
+            seen.extend(item['post']['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, list(Wishlist.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('post_id', flat=True)))
+        self.assertEqual(set(response.data['results'][0]['post']), {'id'})
+
+    def test_wishlisted_ids_support_conditional_requests(self):
+        response = self.client.get('/social/post/wishlist/ids/')
+        self.assertEqual(response.data['count'], 6)
+        self.assertEqual(set(response.data['ids']), set(Post.objects.values_list('id', flat=True)))
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/social/post/wishlist/ids/', HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        Wishlist.objects.filter(user=self.user).first().delete()
+        response = self.client.get('/social/post/wishlist/ids/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.data['count']), (status.HTTP_200_OK, 5))
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        view_buffer.reset()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='fragments@example.com')
+        self.client.force_authenticate(user=self.user)
+        self.posts = [
+            Post.objects.create(user=self.user, content=f'Fragment {i}', target_category='Women', approval=True)
+            for i in range(4)
+        ]
+
+    def hydrated(self, url):
+        with mock.patch('social.fragments.hydrate_cards', wraps=fragments.hydrate_cards) as hydrate:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post.id for call in hydrate.call_args_list for post in call.args[0]], response
+
+    def test_cached_cards_are_not_rendered_again(self):
+        rendered, _ = self.hydrated('/social/posts/?page_size=4')
+        self.assertEqual(len(rendered), 4)
+        rendered, response = self.hydrated('/social/posts/?page_size=3')
+        self.assertEqual(rendered, [])
+        self.assertEqual(response.data['results'][0]['content'], 'Fragment 3')
+
+    def test_live_counters_bypass_the_fragment(self):
+        self.hydrated('/social/posts/?page_size=4')
+        Post.objects.filter(id=self.posts[3].id).update(like_count=42, views=7)
+        rendered, response = self.hydrated('/social/posts/?page_size=2')
+        self.assertEqual(rendered, [])
+        self.assertEqual((response.data['results'][0]['likes_count'], response.data['results'][0]['views']), (42, 7))
+
+    def test_edits_and_comments_invalidate_only_their_post(self):
+        self.hydrated('/social/posts/?page_size=4')
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.posts[0], user=self.user, content='First!')
+            post = Post.objects.get(id=self.posts[1].id)
+            post.content = 'Edited'
+            post.save()
+
+        rendered, response = self.hydrated('/social/posts/?page_size=4')
+        self.assertEqual(sorted(rendered), [self.posts[0].id, self.posts[1].id])
+        cards = {card['id']: card for card in response.data['results']}
+        self.assertEqual(cards[self.posts[1].id]['content'], 'Edited')
+        self.assertEqual(cards[self.posts[0].id]['comments'][0]['content'], 'First!')
+
+    def test_saving_a_stale_instance_still_invalidates_its_fragment(self):
+        post = Post.objects.get(id=self.posts[0].id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=post, user=self.user, content='Bumps the version')
+        self.hydrated('/social/posts/?page_size=4')
+
+        post.content = 'Edited after the comment'
+        post.save()
+        self.assertEqual(post.cache_version, Post.objects.get(id=post.id).cache_version)
+        rendered, response = self.hydrated('/social/posts/?page_size=4&fields=id,content')
+        self.assertEqual(rendered, [post.id])
+        self.assertIn('Edited after the comment', [card['content'] for card in response.data['results']])
+
+    def test_nested_users_stay_fresh_in_cached_fragments(self):
+        commenter = User.objects.create_user(username='commenter@example.com', first_name='Old')
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.posts[0], user=commenter, content='Hi')
+        self.hydrated('/social/posts/?page_size=4')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            commenter.first_name = 'New'
+            commenter.save()
+        # The page, then the commenter's card: nothing is re-rendered
+        with self.assertNumQueries(2):
+            rendered, response = self.hydrated('/social/posts/?page_size=4&fields=id,comments,user')
+        self.assertEqual(rendered, [])
+        cards = {card['id']: card for card in response.data['results']}
+        self.assertEqual(cards[self.posts[0].id]['comments'][0]['user']['first_name'], 'New')
+
+
+
+@mock.patch('notification.dispatch.DISPATCH_SYNC', True)
+class ModerationAdminTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='moderator@example.com', email='moderator@example.com', password='password123')
+        self.client.force_login(self.admin)
+        self.author = User.objects.create_user(username='moderated@example.com')
+        self.follower = User.objects.create_user(username='moderation-fan@example.com')
+        Profile.objects.create(user=self.follower, gender='Male').following.add(Profile.objects.create(user=self.author, gender='Male'))
+        self.category = Category.objects.create(name='Moderated')
+        self.posts = [
+            Post.objects.create(user=self.author, content=f'Pending shirt {i}', category=self.category, target_category='Men')
+            for i in range(3)
+        ]
+
+    def moderate(self, action, posts):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin/social/post/', {
+                'action': action, '_selected_action': [post.id for post in posts],
+            })
+        self.assertEqual(response.status_code, 302)
+
+    def test_bulk_approval_applies_the_approval_side_effects(self):
+        facet_cube()
+        self.moderate('approve_posts', self.posts)
+
+        self.assertEqual(Post.objects.filter(approval=True).count(), 3)
+        self.assertEqual(TimelineEntry.objects.filter(user=self.follower).count(), 3)
+        self.assertEqual(Notification.objects.filter(user=self.author, title='Post approved').count(), 3)
+        self.assertEqual(sum(row[-1] for row in facet_cube()['rows']), 3)
+        self.client.force_login(self.author)
+        self.assertEqual(len(self.client.get('/social/posts/search/?query=shirt').data['results']), 3)
+
+        self.client.force_login(self.admin)
+        self.moderate('reject_posts', self.posts[:2])
+        self.assertEqual(list(Post.objects.filter(approval=True)), [self.posts[2]])
+        self.assertEqual(TimelineEntry.objects.filter(user=self.follower).count(), 1)
+        self.assertEqual(Notification.objects.filter(user=self.author, title='Post not approved').count(), 2)
+
+    def test_rejecting_pending_posts_notifies_their_authors(self):
+        self.client.post('/admin/social/post/', {'action': 'approve_posts', '_selected_action': [self.posts[0].id]})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin/social/post/', {
+                'action': 'reject_posts', '_selected_action': [post.id for post in self.posts[1:]],
+            }, follow=True)
+        self.assertContains(response, 'Rejected 2 posts.')
+        self.assertEqual(Notification.objects.filter(user=self.author, title='Post not approved').count(), 2)
+        self.assertEqual(Post.objects.filter(approval=False).count(), 2)
+        self.assertTrue(Post.objects.get(id=self.posts[0].id).approval)
+
+    def test_changelists_do_not_query_per_row(self):
+        for post in self.posts:
+            Comment.objects.create(post=post, user=self.follower, content='Nice')
+            Wishlist.objects.create(post=post, user=self.follower)
+        Notification.objects.create(user=self.author, title='Hello')
+
+        for url in ['/admin/social/post/', '/admin/social/comment/', '/admin/social/wishlist/', '/admin/notification/notification/']:
+            with CaptureQueriesContext(connection) as few:
+                self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+            Post.objects.create(user=self.follower, content='More', target_category='Men')
+            Comment.objects.create(post=self.posts[0], user=self.author, content='More')
+            Wishlist.objects.create(post=Post.objects.latest('id'), user=self.author)
+            Notification.objects.create(user=self.follower, title='More')
+            with CaptureQueriesContext(connection) as more:
+                self.client.get(url)
+            self.assertEqual(len(few), len(more), url)
+
+    def test_huge_unfiltered_changelists_use_an_estimated_count(self):
+        with mock.patch('mat.admin.EXACT_COUNT_LIMIT', 1):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get('/admin/social/post/')
+        self.assertEqual(response.context['cl'].result_count, Post.objects.latest('id').id)
+        self.assertFalse([q for q in context.captured_queries if 'COUNT(' in q['sql'] and 'social_post' in q['sql']])
+
+
+class FollowSuggestionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.users = {name: User.objects.create_user(username=f'{name}@example.com') for name in ['ann', 'bob', 'cat', 'dan', 'eve', 'fay']}
+        self.profiles = {name: Profile.objects.create(user=user, gender='Female') for name, user in self.users.items()}
+        follows = {'ann': ['bob', 'cat'], 'bob': ['dan', 'ann'], 'cat': ['dan', 'eve']}
+        for name, followed in follows.items():
+            self.profiles[name].following.add(*[self.profiles[other] for other in followed])
+        # ann and fay like the same two posts; nobody else does
+        for i in range(2):
+            post = Post.objects.create(user=self.users['bob'], content=f'Shared {i}', target_category='Women', approval=True)
+            post.likes.add(self.users['ann'], self.users['fay'])
+
+    def suggestions(self, user):
+        self.client.force_authenticate(user=user)
+        return [card['username'].split('@')[0] for card in self.client.get('/social/people/suggested/').data['results']]
+
+    def test_friends_of_friends_and_shared_engagement_are_ranked(self):
+        call_command('build_follow_suggestions', stdout=StringIO())
+        # dan is followed by both of ann's followees; eve by one; fay shares likes
+        self.assertEqual(self.suggestions(self.users['ann']), ['dan', 'eve', 'fay'])
+        self.assertEqual(self.suggestions(self.users['bob']), ['cat'])
+
+        self.profiles['ann'].following.add(self.profiles['dan'])
+        self.assertEqual(self.suggestions(self.users['ann']), ['eve', 'fay'])
+
+    def test_rebuilding_updates_rows_and_drops_stale_ones(self):
+        FollowSuggestion.objects.create(user=self.users['ann'], suggested_ids=[self.users['fay'].id], scores=[9.0])
+        FollowSuggestion.objects.create(user=self.users['eve'], suggested_ids=[self.users['ann'].id], scores=[1.0])
+        out = StringIO()
+        call_command('build_follow_suggestions', stdout=out)
+        self.assertIn('removed 1 stale', out.getvalue())
+        self.assertEqual(self.suggestions(self.users['ann']), ['dan', 'eve', 'fay'])
+        self.assertFalse(FollowSuggestion.objects.filter(user=self.users['eve']).exists())
+
+    def test_batching_does_not_change_the_results(self):
+        graph = suggestions.SuggestionGraph()
+        whole = [(s.user_id, s.suggested_ids, s.scores) for batch in suggestions.build_suggestions(graph) for s in batch]
+        self.assertGreater(len(graph.batches(max_nnz=1)), 1)
+        split = [(s.user_id, s.suggested_ids, s.scores) for batch in suggestions.build_suggestions(graph, max_nnz=1) for s in batch]
+        self.assertEqual(whole, split)
+        top = [(s.user_id, s.suggested_ids) for batch in suggestions.build_suggestions(graph, top_k=1) for s in batch]
+        self.assertEqual(top, [(user_id, ids[:1]) for user_id, ids, _ in whole])
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.db.models import F
+from authentication.models import Profile
+from .models import Post, TimelineEntry
+
+FANOUT_BATCH_SIZE = getattr(settings, 'TIMELINE_FANOUT_BATCH_SIZE', 1000)
+FANOUT_FOLLOWER_LIMIT = getattr(settings, 'TIMELINE_FANOUT_FOLLOWER_LIMIT', 10000)
+FOLLOW_BACKFILL_LIMIT = getattr(settings, 'TIMELINE_FOLLOW_BACKFILL_LIMIT', 50)
+
+Follow = Profile.following.through
+
+
+def follower_ids(author_id):
+    """Stream the user ids following `author_id`, in pk order."""
+    return (
+        Follow.objects.filter(to_profile__user_id=author_id)
+        .order_by('pk')
+        .values_list('from_profile__user_id', flat=True)
+        .iterator(chunk_size=FANOUT_BATCH_SIZE)
+    )
+
+
+def fan_out_post(post):
+    """
+    Push an approved post into the home timeline of its author and of every
+    follower. Authors above FANOUT_FOLLOWER_LIMIT are switched to
+    fan-out-on-read instead, and their posts are merged in when read.
+    """
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=post.user_id, post_id=post.id, created_at=post.created_at)],
+        ignore_conflicts=True,
+    )
+
+    profile = Profile.objects.filter(user_id=post.user_id).only('id', 'fanout_on_read', 'follower_count').first()
+    if profile is None or profile.fanout_on_read:
+        return
+
+    if profile.follower_count > FANOUT_FOLLOWER_LIMIT:
+        Profile.objects.filter(id=profile.id).update(fanout_on_read=True)
+        return
+
+    batch = []
+    for user_id in follower_ids(post.user_id):
+        batch.append(TimelineEntry(user_id=user_id, post_id=post.id, created_at=post.created_at))
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def retract_post(post):
+    retract_posts([post.id])
+
+
+def retract_posts(post_ids):
+    TimelineEntry.objects.filter(post_id__in=post_ids).delete()
+
+
+def follow_pairs(pairs):
+    """Map (follower, followed) profile id pairs to user ids, with whether the followed author is fanned out on read."""
+    profiles = {
+        profile_id: (user_id, on_read)
+        for profile_id, user_id, on_read in Profile.objects.filter(id__in={id for pair in pairs for id in pair})
+        .values_list('id', 'user_id', 'fanout_on_read')
+    }
+    return [
+        (profiles[follower][0], *profiles[target])
+        for follower, target in pairs
+        if follower in profiles and target in profiles
+    ]
+
+
+def add_followed_posts(pairs):
+    """
+    Backfill each new follower's timeline with the latest
+    FOLLOW_BACKFILL_LIMIT approved posts of the author they followed.
+    Fan-out-on-read authors are merged in when read instead.
+    """
+    entries = []
+    for follower_id, author_id, on_read in follow_pairs(pairs):
+        if on_read:
+            continue
+        recent = (
+            Post.objects.filter(user_id=author_id, approval=True)
+            .order_by('-created_at', '-id')
+            .values_list('id', 'created_at')[:FOLLOW_BACKFILL_LIMIT]
+        )
+        entries += [TimelineEntry(user_id=follower_id, post_id=post_id, created_at=created_at) for post_id, created_at in recent]
+    TimelineEntry.objects.bulk_create(entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+def remove_followed_posts(pairs):
+    """Drop the unfollowed authors' posts from each former follower's timeline."""
+    authors = {}
+    for follower_id, author_id, _ in follow_pairs(pairs):
+        authors.setdefault(follower_id, set()).add(author_id)
+    for follower_id, author_ids in authors.items():
+        TimelineEntry.objects.filter(user_id=follower_id, post__user_id__in=author_ids).delete()
+
+
+def timeline_sources(user):
+    """
+    Querysets whose rows expose `post_id` and `created_at`: the precomputed
+    entries, plus the posts of followed fan-out-on-read authors.
+    """
+    sources = [TimelineEntry.objects.filter(user=user)]
+    pulled_authors = list(
+        Follow.objects.filter(from_profile__user=user, to_profile__fanout_on_read=True)
+        .values_list('to_profile__user_id', flat=True)
+    )
+    if pulled_authors:
+        sources.append(
+            Post.objects.filter(user_id__in=pulled_authors, approval=True)
+            .annotate(post_id=F('id'))
+        )
+    return sources
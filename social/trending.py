@@ -0,0 +1,16 @@
+import math
+from django.conf import settings
+
+TRENDING_HALF_LIFE_HOURS = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24)
+
+
+def trending_score(like_count, comment_count, created_at):
+    """
+    Engagement decayed by half every TRENDING_HALF_LIFE_HOURS, kept in log
+    space: log2(1 + engagement) + created_at / half_life ranks posts exactly
+    like (1 + engagement) * 2 ** (-age / half_life), but a stored score never
+    has to be re-decayed as time passes. Only posts with new engagement need
+    rescoring.
+    """
+    engagement = like_count + comment_count
+    return math.log2(1 + engagement) + created_at.timestamp() / (TRENDING_HALF_LIFE_HOURS * 3600)
@@ -3,12 +3,18 @@ from . import views
 
 urlpatterns = [
     path('posts/', views.PostListCreateView.as_view(), name='post-list-create'),
+    path('timeline/', views.HomeTimelineView.as_view(), name='home-timeline'),
+    path('posts/<int:post_id>/', views.PostDetailView.as_view(), name='post-detail'),
     path('posts/<int:post_id>/comments/', views.CommentListCreateView.as_view(), name='comment-list-create'),
     path('posts/<int:post_id>/likes/', views.PostLikeView.as_view(), name='post-likes'),
     path('post/<int:post_id>/wishlist/', views.WishListView.as_view(), name='wishlist'),
     path('post/wishlist/', views.WishListView.as_view(), name='wishlist'),
+    path('post/wishlist/ids/', views.WishlistIdsView.as_view(), name='wishlist-ids'),
+    path('engagement/sync/', views.EngagementSyncView.as_view(), name='engagement-sync'),
     path('posts/filter/', views.FilteredPostView.as_view(), name='filtered-posts'),
     path('posts/search/', views.PostSearchView.as_view(), name='post-search'),
     path('posts/trending/', views.TrendingPostView.as_view(), name='trending-posts'),
+    path('posts/views/buffer/', views.PostViewBufferView.as_view(), name='post-view-buffer'),
     path('posts/recommended/', views.RecommendedPostView.as_view(), name='recommended-posts'),
+    path('people/suggested/', views.FollowSuggestionView.as_view(), name='follow-suggestions'),
 ]
\ No newline at end of file
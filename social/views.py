@@ -1,68 +1,139 @@
+import hashlib
+import time
 from django.shortcuts import render
-from django.db.models import Q, Count
-from django.utils import timezone
-from datetime import timedelta
-from .models import Post, PostImage, Comment, Wishlist
-from .serializers import PostSerializer, CommentSerializer, WishlistSerializer
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q, F
+from .models import Post, Comment, Wishlist, TARGET_CATEGORIES
+from .serializers import PostSerializer, PostImageSerializer, CommentSerializer, WishlistSerializer, EngagementOperationSerializer
+from .pagination import PostCursorPagination, CommentCursorPagination, WishlistCursorPagination, TrendingCursorPagination, TimelineCursorPagination, SearchCursorPagination
+from .search import get_search_backend
+from .facets import compute_facets
+from .caching import versioned_cache
+from .impressions import counts_views, view_buffer
+from .images import create_post_images, enqueue_images
+from .timeline import timeline_sources
+from .recommendations import record_engagement, recommend_post_ids
+from .suggestions import suggested_user_ids
+from .engagement import toggle_like, toggle_wishlist, sync_engagement
+from .hydration import hydrate_posts, related_user_ids, add_viewer_state, with_viewer_state
+from .fragments import render_cards, select_fields
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
-from rest_framework.parsers import MultiPartParser, FormParser
-from notification.fcm_utils import send_push_notification
+from rest_framework.parsers import FormParser
+from authentication.cards import get_user_cards
+from mat.uploads import ImageMultiPartParser
+from notification.dispatch import dispatch_notification
 
 # Create your views here.
 
+def split_param(request, name):
+    value = request.query_params.get(name, '')
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def parse_state(request, name):
+    """An explicit true/false `name` in the body makes a toggle idempotent; absent means flip."""
+    value = request.data.get(name)
+    if value is None:
+        return None
+    return str(value).lower() in ('1', 'true')
+
+
+def card_data(posts, request):
+    return select_fields(render_cards(posts), split_param(request, 'fields'))
+
+
 class PostListCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser]
+    parser_classes = [ImageMultiPartParser, FormParser]
 
+    @counts_views
+    @with_viewer_state
     def get(self, request):
-        posts = Post.objects.filter(approval=True).order_by('-created_at')
-        serializer = PostSerializer(posts, many=True)
-        return Response(serializer.data)
+        paginator = PostCursorPagination()
+        page = paginator.paginate_queryset(Post.objects.filter(approval=True), request, view=self)
+        return paginator.get_paginated_response(card_data(page, request))
 
     def post(self, request):
         serializer = PostSerializer(data=request.data)
-        if serializer.is_valid():
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        files = request.FILES.getlist('images')
+        with transaction.atomic():
             post = serializer.save(user=request.user)
+            images = create_post_images([(post, upload) for upload in files])
+            # Variants are rendered in the background once the post is committed
+            enqueue_images([image.id for image in images])
 
-            # Handle multiple image uploads
-            images = request.FILES.getlist('images')
-            for image in images:
-                PostImage.objects.create(post=post, image=image)
+        # Built from the objects just written instead of reloading the post
+        data = PostSerializer(post, fields=[name for name in serializer.fields if name != 'images']).data
+        data['images'] = PostImageSerializer(images, many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
 
-            # Re-serialize to include the newly created images
-            response_serializer = PostSerializer(post)
-            return Response(response_serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class PostDetailView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @counts_views
+    @with_viewer_state
+    def get(self, request, post_id):
+        post = Post.objects.filter(Q(approval=True) | Q(user=request.user)).filter(id=post_id).first()
+        if post is None:
+            return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        expand = split_param(request, 'expand')
+        hydrate_posts([post], expand=expand)
+        serializer = PostSerializer(
+            post, fields=split_param(request, 'fields'), expand=expand,
+            context={'user_cards': get_user_cards(related_user_ids([post]))},
+        )
+        return Response(serializer.data, status=status.HTTP_200_OK)
     
 
+class HomeTimelineView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @counts_views
+    @with_viewer_state
+    def get(self, request):
+        paginator = TimelineCursorPagination()
+        entries = paginator.paginate_sources(timeline_sources(request.user), request, view=self)
+
+        posts = Post.objects.filter(approval=True).in_bulk([entry.post_id for entry in entries])
+        page = [posts[entry.post_id] for entry in entries if entry.post_id in posts]
+        return paginator.get_paginated_response(card_data(page, request))
+
+
 class CommentListCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, post_id):
-        comments = Comment.objects.filter(post_id=post_id).order_by('-created_at')
-        serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data)
+        paginator = CommentCursorPagination()
+        page = paginator.paginate_queryset(Comment.objects.filter(post_id=post_id), request, view=self)
+        context = {'user_cards': get_user_cards(comment.user_id for comment in page)}
+        return paginator.get_paginated_response(CommentSerializer(page, many=True, context=context).data)
 
     def post(self, request, post_id):
         serializer = CommentSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(user=request.user, post_id=post_id)
+            with transaction.atomic():
+                serializer.save(user=request.user, post_id=post_id)
+                Post.objects.filter(id=post_id).update(comment_count=F('comment_count') + 1, trending_stale=True)
+                post = Post.objects.filter(id=post_id).first()
+                if post is not None:
+                    record_engagement(request.user.id, post, 'comment')
 
             # Send notification to post owner
-            try:
-                post = Post.objects.get(id=post_id)
-                if post.user != request.user:
-                    send_push_notification(
-                        user=post.user,
-                        title="New Comment",
-                        body=f"{request.user.username} commented on your post.",
-                        data={"type": "comment", "post_id": str(post_id)}
-                    )
-                    print("Notification sent successfully")
-            except Post.DoesNotExist:
-                pass
+            if post is not None and post.user_id != request.user.id:
+                dispatch_notification(
+                    post.user_id,
+                    title="New Comment",
+                    body=f"{request.user.username} commented on your post.",
+                    data={"type": "comment", "post_id": str(post_id)}
+                )
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -73,72 +144,133 @@ class PostLikeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, post_id):
-        post = Post.objects.get(id=post_id)
-        if post.likes.filter(id=request.user.id).exists():
-            post.likes.remove(request.user)
-            return Response({'message': 'Post disliked successfully'}, status=status.HTTP_200_OK)
-        else:
-            post.likes.add(request.user)
+        post = Post.objects.filter(id=post_id).only('id', 'user_id', 'category_id', 'occasion_id', 'target_category').first()
+        if post is None:
+            return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
 
-            # Send notification to post owner
-            if post.user != request.user:
-                send_push_notification(
-                    user=post.user,
-                    title="New Like",
-                    body=f"{request.user.username} liked your post.",
-                    data={"type": "like", "post_id": str(post_id)}
-                )
+        liked, changed, likes = toggle_like(post, request.user.id, liked=parse_state(request, 'liked'))
+
+        # Send notification to post owner
+        if liked and changed and post.user_id != request.user.id:
+            dispatch_notification(
+                post.user_id,
+                title="New Like",
+                body=f"{request.user.username} liked your post.",
+                data={"type": "like", "post_id": str(post_id)}
+            )
 
-            return Response({'message': 'Post liked successfully'}, status=status.HTTP_200_OK)
+        message = 'Post liked successfully' if liked else 'Post disliked successfully'
+        return Response({'message': message, 'liked': liked, 'likes': likes}, status=status.HTTP_200_OK)
     
     def get(self, request, post_id):
         post = Post.objects.get(id=post_id)
-        return Response({'likes': post.likes.count()})
+        return Response({'likes': post.like_count})
     
 class WishListView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    # Get all wishlisted posts by the logged-in user
+    # Page through the logged-in user's wishlist, newest first
     def get(self, request):
-        wishlists = Wishlist.objects.filter(user=request.user).order_by('-created_at')
-        serializer = WishlistSerializer(wishlists, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = WishlistCursorPagination()
+        page = paginator.paginate_queryset(
+            Wishlist.objects.filter(user=request.user).select_related('post'), request, view=self,
+        )
+        cards = card_data([wishlist.post for wishlist in page], request)
+        add_viewer_state(cards, request, split_param(request, 'fields'))
+        data = WishlistSerializer(page, many=True, context={'cards': dict(zip([w.post_id for w in page], cards))}).data
+        return paginator.get_paginated_response(data)
 
     def post(self, request, post_id):
-        try:
-            post = Post.objects.get(id=post_id)
-        except Post.DoesNotExist:
+        post = Post.objects.filter(id=post_id).only('id', 'user_id', 'category_id', 'occasion_id', 'target_category').first()
+        if post is None:
             return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        wishlist = Wishlist.objects.filter(post=post, user=request.user)
+        wishlisted, changed, count = toggle_wishlist(post, request.user.id, wishlisted=parse_state(request, 'wishlisted'))
+        if not wishlisted:
+            return Response({"message": "Removed from wishlist", "wishlisted": False, "wishlist_count": count}, status=status.HTTP_200_OK)
+
+        # Send notification to post owner
+        if changed and post.user_id != request.user.id:
+            dispatch_notification(
+                post.user_id,
+                title="New Wishlist",
+                body=f"{request.user.username} wishlisted your post.",
+                data={"type": "wishlist", "post_id": str(post_id)}
+            )
+
+        return Response(
+            {"message": "Added to wishlist", "wishlisted": True, "wishlist_count": count},
+            status=status.HTTP_201_CREATED if changed else status.HTTP_200_OK,
+        )
+
 
-        if wishlist.exists():
-            wishlist.delete()
-            return Response({"message": "Removed from wishlist"}, status=status.HTTP_200_OK)
+
+class WishlistIdsView(APIView):
+    """Every post id the user has wishlisted, for clients that keep membership locally."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        ids = list(
+            Wishlist.objects.filter(user=request.user).order_by('-created_at', '-id').values_list('post_id', flat=True)
+        )
+        etag = '"%s"' % hashlib.sha1(','.join(map(str, ids)).encode()).hexdigest()
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
         else:
-            Wishlist.objects.create(post=post, user=request.user)
+            response = Response({'count': len(ids), 'ids': ids}, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        return response
 
-            # Send notification to post owner
-            if post.user != request.user:
-                send_push_notification(
-                    user=post.user,
-                    title="New Wishlist",
-                    body=f"{request.user.username} wishlisted your post.",
-                    data={"type": "wishlist", "post_id": str(post_id)}
-                )
 
-            return Response({"message": "Added to wishlist"}, status=status.HTTP_201_CREATED)
+class EngagementSyncView(APIView):
+    """Replay a batch of likes, wishlists and comments queued by an offline client."""
+    permission_classes = [permissions.IsAuthenticated]
+    max_operations = getattr(settings, 'ENGAGEMENT_SYNC_MAX_OPERATIONS', 200)
+
+    def post(self, request):
+        operations = request.data.get('operations')
+        if not isinstance(operations, list) or not operations:
+            return Response({"error": "operations must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > self.max_operations:
+            return Response({"error": f"At most {self.max_operations} operations per batch"}, status=status.HTTP_400_BAD_REQUEST)
+
+        valid, invalid = [], {}
+        for index, operation in enumerate(operations):
+            serializer = EngagementOperationSerializer(data=operation)
+            if serializer.is_valid():
+                valid.append(serializer.validated_data)
+            else:
+                invalid[index] = serializer.errors
+
+        try:
+            applied = iter(sync_engagement(request.user, valid)) if valid else iter(())
+        except IntegrityError:
+            return Response({"error": "Batch conflicts with a concurrent replay, retry it"}, status=status.HTTP_409_CONFLICT)
 
+        results = []
+        for index, operation in enumerate(operations):
+            if index in invalid:
+                client_id = operation.get('client_id') if isinstance(operation, dict) else None
+                results.append({'client_id': client_id, 'status': 'error', 'error': invalid[index]})
+            else:
+                results.append(next(applied))
+        return Response({'results': results}, status=status.HTTP_200_OK)
 
 
 class FilteredPostView(APIView):
     permission_classes = [permissions.AllowAny]
 
+    @counts_views
+    @with_viewer_state
+    @versioned_cache('filter')
     def get(self, request):
         category = request.query_params.get('category')
         occasion = request.query_params.get('occasion')
         target = request.query_params.get('target')
 
+        if (category and not category.isdigit()) or (occasion and not occasion.isdigit()):
+            return Response({"error": "category and occasion must be ids"}, status=status.HTTP_400_BAD_REQUEST)
+
         posts = Post.objects.filter(approval=True)  # base queryset
 
         if category:
@@ -150,94 +282,92 @@ class FilteredPostView(APIView):
         if target:
             posts = posts.filter(target_category=target)
 
-        serializer = PostSerializer(posts.order_by('-created_at'), many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = PostCursorPagination()
+        page = paginator.paginate_queryset(posts, request, view=self)
+        response = paginator.get_paginated_response(card_data(page, request))
+
+        if request.query_params.get('facets') in ('1', 'true'):
+            response.data['facets'] = compute_facets(
+                category=int(category) if category else None,
+                occasion=int(occasion) if occasion else None,
+                target=target or None,
+            )
+        return response
 
 
 class PostSearchView(APIView):
     permission_classes = [permissions.AllowAny]
 
+    @counts_views
+    @with_viewer_state
+    @versioned_cache('search')
     def get(self, request):
         query = request.query_params.get('query', '').strip()
 
         if not query:
-            return Response([], status=status.HTTP_200_OK)
-
-        posts = Post.objects.filter(
-            Q(approval=True) & (
-                Q(content__icontains=query) |
-                Q(category__name__icontains=query) |
-                Q(occasion__name__icontains=query) |
-                Q(target_category__icontains=query)
-            )
-        ).order_by('-created_at')
+            return Response({'next': None, 'results': []}, status=status.HTTP_200_OK)
 
-        serializer = PostSerializer(posts, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = SearchCursorPagination()
+        hits = paginator.paginate_search(get_search_backend(), query, request, view=self)
+
+        posts = Post.objects.filter(approval=True).in_bulk([hit.post_id for hit in hits])
+        page = [posts[hit.post_id] for hit in hits if hit.post_id in posts]
+        results = card_data(page, request)
+        snippets = {hit.post_id: hit.snippet for hit in hits}
+        for card in results:
+            card['snippet'] = snippets.get(card.get('id'))
+        return paginator.get_paginated_response(results)
 
 
 class TrendingPostView(APIView):
     permission_classes = [permissions.AllowAny]
 
+    @counts_views
+    @with_viewer_state
+    @versioned_cache('trending')
     def get(self, request):
-        one_month_ago = timezone.now() - timedelta(days=30)
-
-        posts = Post.objects.filter(
-            approval=True,
-            created_at__gte=one_month_ago
-        ).annotate(
-            likes_count=Count('likes'),
-            comments_count=Count('comment'),
-            engagement=Count('likes') + Count('comment')
-        ).order_by('-engagement', '-created_at')
-
-        serializer = PostSerializer(posts, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        posts = Post.objects.filter(approval=True)
+
+        target = request.query_params.get('target')
+        if target:
+            if target not in dict(TARGET_CATEGORIES):
+                return Response({"error": "Invalid target"}, status=status.HTTP_400_BAD_REQUEST)
+            posts = posts.filter(target_category=target)
+
+        paginator = TrendingCursorPagination()
+        page = paginator.paginate_queryset(posts, request, view=self)
+        return paginator.get_paginated_response(card_data(page, request))
 
 
 class RecommendedPostView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @counts_views
+    @with_viewer_state
     def get(self, request):
-        user = request.user
-
-        # Collect post IDs the user has engaged with
-        liked_posts = Post.objects.filter(likes=user)
-        commented_posts = Post.objects.filter(comment__user=user)
-        wishlisted_posts = Post.objects.filter(wishlisted_by__user=user)
-
-        engaged_posts = liked_posts | commented_posts | wishlisted_posts
-        engaged_post_ids = engaged_posts.values_list('id', flat=True).distinct()
-
-        # Extract user interests from engaged posts
-        categories = engaged_posts.values_list('category', flat=True).distinct()
-        occasions = engaged_posts.values_list('occasion', flat=True).distinct()
-        targets = engaged_posts.values_list('target_category', flat=True).distinct()
-
-        # Filter out None values
-        categories = [c for c in categories if c is not None]
-        occasions = [o for o in occasions if o is not None]
-        targets = [t for t in targets if t]
-
-        # If user has no engagement history, return empty
-        if not categories and not occasions and not targets:
-            return Response([], status=status.HTTP_200_OK)
-
-        # Build Q filter for matching interests
-        interest_filter = Q()
-        if categories:
-            interest_filter |= Q(category_id__in=categories)
-        if occasions:
-            interest_filter |= Q(occasion_id__in=occasions)
-        if targets:
-            interest_filter |= Q(target_category__in=targets)
-
-        # Get recommended posts: approved, matching interests, not already engaged
-        posts = Post.objects.filter(
-            Q(approval=True) & interest_filter
-        ).exclude(
-            id__in=engaged_post_ids
-        ).order_by('-created_at')
-
-        serializer = PostSerializer(posts, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        limit = PostCursorPagination().get_page_size(request)
+        post_ids = recommend_post_ids(request.user, limit)
+
+        posts = Post.objects.all().in_bulk(post_ids)
+        page = [posts[post_id] for post_id in post_ids if post_id in posts]
+        return Response({'next': None, 'results': card_data(page, request)}, status=status.HTTP_200_OK)
+
+
+class FollowSuggestionView(APIView):
+    """People the requester may know, precomputed by build_follow_suggestions."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        limit = PostCursorPagination().get_page_size(request)
+        user_ids = suggested_user_ids(request.user, limit)
+        cards = get_user_cards(user_ids)
+        return Response({'next': None, 'results': [cards[user_id] for user_id in user_ids if user_id in cards]}, status=status.HTTP_200_OK)
+
+
+class PostViewBufferView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        depth = view_buffer.depth()
+        depth['seconds_since_flush'] = round(time.monotonic() - view_buffer.last_flush, 1)
+        return Response(depth, status=status.HTTP_200_OK)